@@ -0,0 +1,301 @@
+"""Benchmark the hot routes in-process or over HTTP and compare against a stored baseline.
+
+    python seed.py --scale small --database sqlite:////tmp/bench.db
+    python bench.py --database sqlite:////tmp/bench.db --save-baseline bench-baseline.json
+    python bench.py --database sqlite:////tmp/bench.db --baseline bench-baseline.json   # exits 1 on regression
+    python bench.py --url http://localhost:8080 --requests 500 --concurrency 8 --only index post_detail
+    python bench.py --database sqlite:////tmp/bench.db --cold-start 5 --only index
+
+Each scenario gets a short warm-up, then --requests requests spread over --concurrency
+threads. Throughput and p50/p99 latency are measured client-side. Queries per request
+come from the app's own /admin/metrics counters, so they work the same over HTTP.
+Time to first byte is taken when the first body byte arrives, which is what streamed
+pages improve. --cold-start starts fresh processes (with and without the startup
+warm-up) and times the import, create_app() and the first two requests. The
+accounts are the ones seed.py creates ('user1' as the reader, 'writer1' - the most
+prolific author - for the writer pages, 'admin' for admin pages).
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import subprocess
+import statistics
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadtest import percentile
+from seed import PASSWORD, WORDS
+
+
+# name -> (metrics endpoint, method, account, path builder)
+SCENARIOS = {
+    'index': ('index', 'GET', None, lambda ctx: '/'),
+    'all_posts': ('all_posts', 'GET', None, lambda ctx: '/all-posts'),
+    'post_detail': ('post_detail', 'GET', None, lambda ctx: f'/post/{ctx.hot_post()}'),
+    'post_detail_reader': ('post_detail', 'GET', 'reader', lambda ctx: f'/post/{ctx.hot_post()}'),
+    'search_api': ('search_api', 'GET', None, lambda ctx: f'/api/search?q={ctx.rng.choice(WORDS)}'),
+    'like_toggle': ('toggle_post_like', 'POST', 'reader', lambda ctx: f'/api/like-post/{ctx.hot_post()}'),
+    'bookmark_toggle': ('toggle_bookmark', 'POST', 'reader', lambda ctx: f'/api/bookmark/{ctx.hot_post()}'),
+    'dashboard_writer': ('dashboard_writer', 'GET', 'writer', lambda ctx: '/writer/dashboard'),
+    'manage_posts': ('manage_posts', 'GET', 'writer', lambda ctx: f'/writer/posts?page={ctx.rng.randint(1, 5)}'),
+    'admin_post_reports': ('admin_post_reports', 'GET', 'admin', lambda ctx: '/admin/reports/posts'),
+    'admin_comment_reports': ('admin_comment_reports', 'GET', 'admin', lambda ctx: '/admin/reports/comments'),
+}
+ACCOUNTS = {'reader': 'user1', 'writer': 'writer1', 'admin': 'admin'}
+COLUMNS = ['scenario', 'requests', 'errors', 'rps', 'p50_ms', 'p99_ms', 'ttfb_ms', 'queries']
+
+# Run in a fresh interpreter per sample; prints one JSON line of timings
+COLD_START_PROBE = '''
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.create_app()
+ready = time.perf_counter()
+client = app.test_client()
+timings = {'import_ms': (imported - started) * 1000, 'startup_ms': (ready - imported) * 1000}
+for label in ('first_request_ms', 'second_request_ms'):
+    before = time.perf_counter()
+    client.get('/').close()
+    timings[label] = (time.perf_counter() - before) * 1000
+print(json.dumps(timings))
+'''
+
+
+class InProcessTransport:
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, cookie=None, form=None):
+        # Returns (status, body, headers, seconds to the first body chunk)
+        if not hasattr(self._local, 'client'): self._local.client = self.app.test_client(use_cookies=False)
+        started, ttfb, body = time.perf_counter(), None, []
+        response = self._local.client.open(path, method=method, data=form, headers={'Cookie': cookie} if cookie else {}, buffered=False)
+        for chunk in response.iter_encoded():
+            if ttfb is None: ttfb = time.perf_counter() - started
+            body.append(chunk)
+        response.close()
+        return response.status_code, b''.join(body), response.headers, ttfb or time.perf_counter() - started
+
+
+class HttpTransport:
+    def __init__(self, base_url, timeout=30):
+        parts = urllib.parse.urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.netloc, self.prefix, self.timeout = parts.netloc, parts.path.rstrip('/'), timeout
+        self._local = threading.local()
+
+    def request(self, method, path, cookie=None, form=None):
+        # One keep-alive connection per thread, reopened after any transport error
+        if getattr(self._local, 'conn', None) is None: self._local.conn = self.connection_class(self.netloc, timeout=self.timeout)
+        headers = {'Cookie': cookie} if cookie else {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            started = time.perf_counter()
+            self._local.conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = self._local.conn.getresponse()
+            first = response.read(1)
+            ttfb = time.perf_counter() - started
+            return response.status, first + response.read(), response.headers, ttfb
+        except (http.client.HTTPException, OSError):
+            self._local.conn.close()
+            self._local.conn = None
+            raise
+
+
+class Context:
+    def __init__(self, transport, seed):
+        self.transport = transport
+        self.rng = random.Random(seed)
+        self.cookies = {}
+        self.post_ids, self.post_weights = [], []
+
+    def login(self, account):
+        if account not in self.cookies:
+            status, _, headers, _ = self.transport.request('POST', '/login', form={'username': ACCOUNTS[account], 'password': PASSWORD})
+            cookies = [value.split(';', 1)[0] for value in headers.get_all('Set-Cookie') or []]
+            self.cookies[account] = '; '.join(cookies) if status == 302 and cookies else None
+        return self.cookies[account]
+
+    def load_posts(self, pages=4):
+        # Hot posts are the first few feed pages, hit with a power-law skew like real traffic
+        path = '/api/posts?limit=50'
+        for _ in range(pages):
+            status, body, _, _ = self.transport.request('GET', path)
+            if status != 200: break
+            data = json.loads(body)
+            self.post_ids += [item['id'] for item in data['items']]
+            if not data['next']: break
+            path = f"/api/posts?limit=50&after={urllib.parse.quote(data['next'])}"
+        self.post_weights = [1 / rank ** 1.1 for rank in range(1, len(self.post_ids) + 1)]
+
+    def hot_post(self):
+        return self.rng.choices(self.post_ids, weights=self.post_weights)[0] if self.post_ids else 1
+
+    def sql_counters(self):
+        # {endpoint: (requests, statements)} from the Prometheus text at /admin/metrics
+        cookie = self.login('admin')
+        status, body, _, _ = self.transport.request('GET', '/admin/metrics', cookie=cookie)
+        if status != 200: return None
+        counters = {}
+        for line in body.decode().splitlines():
+            if not line.startswith(('blog_requests_total{', 'blog_sql_statements_total{')): continue
+            name, rest = line.split('{', 1)
+            labels, value = rest.rsplit('} ', 1)
+            endpoint = labels.split('endpoint="', 1)[1].split('"', 1)[0]
+            requests, statements = counters.get(endpoint, (0, 0))
+            if name == 'blog_requests_total': requests += float(value)
+            else: statements += float(value)
+            counters[endpoint] = requests, statements
+        return counters
+
+
+def run_scenario(ctx, name, total, concurrency, warmup):
+    endpoint, method, account, build_path = SCENARIOS[name]
+    cookie = ctx.login(account) if account else None
+    for _ in range(warmup): ctx.transport.request(method, build_path(ctx), cookie=cookie)
+    before = ctx.sql_counters()
+
+    latencies, ttfbs, errors, remaining = [], [], [0], [total]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0: return
+                remaining[0] -= 1
+            path = build_path(ctx)
+            start = time.perf_counter()
+            try:
+                status, _, _, ttfb = ctx.transport.request(method, path, cookie=cookie)
+                ok = status < 400
+            except (http.client.HTTPException, OSError): ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                    ttfbs.append(ttfb)
+                else: errors[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    elapsed = time.perf_counter() - started
+
+    after = ctx.sql_counters()
+    queries = None
+    if before is not None and after is not None:
+        requests = after.get(endpoint, (0, 0))[0] - before.get(endpoint, (0, 0))[0]
+        statements = after.get(endpoint, (0, 0))[1] - before.get(endpoint, (0, 0))[1]
+        queries = statements / requests if requests else None
+    return {'scenario': name, 'requests': total, 'errors': errors[0], 'rps': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 50) * 1000, 'p99_ms': percentile(latencies, 99) * 1000,
+            'ttfb_ms': percentile(ttfbs, 50) * 1000, 'queries': queries}
+
+
+def compare(results, baseline, tolerance):
+    # Slower p99, lower throughput or more queries per request than the baseline allows
+    regressions = []
+    for row in results:
+        base = baseline['results'].get(row['scenario'])
+        if not base: continue
+        if row['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{row['scenario']}: p99 {row['p99_ms']:.1f} ms vs {base['p99_ms']:.1f} ms")
+        if row['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{row['scenario']}: {row['rps']:.1f} req/s vs {base['rps']:.1f} req/s")
+        if base.get('ttfb_ms') and row['ttfb_ms'] > base['ttfb_ms'] * (1 + tolerance):
+            regressions.append(f"{row['scenario']}: TTFB {row['ttfb_ms']:.1f} ms vs {base['ttfb_ms']:.1f} ms")
+        if row['queries'] is not None and base['queries'] is not None and row['queries'] > base['queries'] + 0.5:
+            regressions.append(f"{row['scenario']}: {row['queries']:.1f} queries/request vs {base['queries']:.1f}")
+        if row['errors'] > base['errors']:
+            regressions.append(f"{row['scenario']}: {row['errors']} errors vs {base['errors']}")
+    return regressions
+
+
+def cold_start(runs, database):
+    # Median timings per mode over `runs` fresh processes against the same database
+    env = dict(os.environ, PYTHONWARNINGS='ignore')
+    if database: env['BLOG_SQLALCHEMY_DATABASE_URI'] = database
+    results = {}
+    for mode, warm in (('warm-up', 'true'), ('no warm-up', 'false')):
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-c', COLD_START_PROBE], env=dict(env, BLOG_WARMUP_ON_STARTUP=warm),
+                                    cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+        results[mode] = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+    print(f"{'cold start':>22}  " + '  '.join(f'{key:>18}' for key in results['warm-up']))
+    for mode, timings in results.items():
+        print(f'{mode:>22}  ' + '  '.join(f'{value:>18.1f}' for value in timings.values()))
+    return results
+
+
+def print_table(results, baseline=None):
+    cell = lambda v: '-' if v is None else f'{v:.1f}' if isinstance(v, float) else str(v)
+    print(f"{'scenario':>22}  " + '  '.join(f'{c:>10}' for c in COLUMNS[1:]) + ('  p99 vs baseline' if baseline else ''))
+    for row in results:
+        line = f"{row['scenario']:>22}  " + '  '.join(f'{cell(row[c]):>10}' for c in COLUMNS[1:])
+        base = baseline and baseline['results'].get(row['scenario'])
+        if base and base['p99_ms']: line += f"  {(row['p99_ms'] / base['p99_ms'] - 1) * 100:+15.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Benchmark a running server instead of the app in-process.')
+    parser.add_argument('--database', help='SQLAlchemy URL for in-process runs (default: the app config).')
+    parser.add_argument('--only', nargs='+', choices=SCENARIOS, help='Run a subset of the scenarios.')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario.')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', help='Compare against this JSON file and exit 1 on regression.')
+    parser.add_argument('--save-baseline', help='Write the results to this JSON file.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p99/TTFB/throughput drift against the baseline.')
+    parser.add_argument('--cold-start', type=int, default=0, metavar='RUNS', help='Also time process start-up over this many fresh processes.')
+    args = parser.parse_args()
+    if args.cold_start and args.url: parser.error('--cold-start starts local processes; it cannot be combined with --url')
+
+    if args.url:
+        transport = HttpTransport(args.url)
+    else:
+        if args.database: os.environ['BLOG_SQLALCHEMY_DATABASE_URI'] = args.database
+        import main
+        main.app.logger.setLevel(logging.ERROR)
+        transport = InProcessTransport(main.create_app())
+
+    startup = cold_start(args.cold_start, args.database) if args.cold_start else None
+    ctx = Context(transport, args.seed)
+    ctx.load_posts()
+    if ctx.login('admin') is None: print('warning: could not log in as admin; admin scenarios and query counts will fail')
+    results = [run_scenario(ctx, name, args.requests, args.concurrency, args.warmup) for name in args.only or SCENARIOS]
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'created': datetime.utcnow().isoformat(timespec='seconds'), 'mode': 'http' if args.url else 'in-process',
+                       'requests': args.requests, 'concurrency': args.concurrency, 'cold_start': startup,
+                       'results': {row['scenario']: row for row in results}}, f, indent=2)
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions: print(f'REGRESSION {line}')
+        if regressions: raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
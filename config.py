@@ -0,0 +1,103 @@
+import os
+
+# Defaults for main.py. Override any key without code edits:
+#   - BLOG_SETTINGS=/path/to/settings.py  (a Python file of UPPERCASE assignments)
+#   - BLOG_<KEY>=value                    (e.g. BLOG_SQLALCHEMY_DATABASE_URI=postgresql://...)
+# Environment values are parsed as JSON when possible, so BLOG_DB_POOL_SIZE=20 is an int.
+
+class Config:
+    SECRET_KEY = 'supersecretkey'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///blog.db')
+    UPLOAD_FOLDER = 'static/uploads'
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+    IMAGE_WORKERS = 2
+    IMAGE_QUALITY = 80
+
+    # Number of trusted proxies in front of the app (nginx = 1). Each sets X-Forwarded-For
+    # (and -Proto); leave at 0 when clients connect directly or the headers can be spoofed.
+    # Without it, behind a proxy every client shares the proxy's login-throttle bucket.
+    PROXY_FIX_X_FOR = 0
+    PROXY_FIX_X_PROTO = 0
+
+    # /media/ responses: versioned URLs are cached for a year. Set USE_X_SENDFILE (Apache,
+    # lighttpd) or X_ACCEL_REDIRECT_PREFIX (nginx internal location) to offload file bodies.
+    MEDIA_MAX_AGE = 365 * 24 * 3600
+    USE_X_SENDFILE = False
+    X_ACCEL_REDIRECT_PREFIX = None
+
+    # Startup (create_app): apply pending migrations, then compile templates, open
+    # WARMUP_CONNECTIONS pooled connections and build the homepage before serving
+    SCHEMA_ON_STARTUP = True
+    WARMUP_ON_STARTUP = True
+    WARMUP_CONNECTIONS = 4
+    # all_posts and post_detail are streamed to the client in STREAM_BUFFER_SIZE chunks
+    STREAM_TEMPLATES = True
+    STREAM_BUFFER_SIZE = 8192
+
+    HOMEPAGE_CACHE_TTL = 60
+    POSTS_PER_PAGE = 20
+    COMMENTS_PER_PAGE = 20
+    MODERATION_PER_PAGE = 25
+    POST_TOTAL_CACHE_TTL = 300
+    FRAGMENT_CACHE_TTL = 600
+    USER_CACHE_TTL = 30
+
+    # Cache backend: 'memory', 'redis' (needs the redis package) or 'package.module.Class'
+    CACHE_BACKEND = 'memory'
+    CACHE_MAX_ENTRIES = 2048
+    CACHE_REDIS_URL = 'redis://localhost:6379/0'
+
+    # Password hashing: werkzeug method string plus salt length. 'pbkdf2:sha256' uses werkzeug's
+    # current iteration count. Hashes made with a different method or a lower cost are upgraded
+    # on the user's next successful login; stronger ones are left alone.
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256'
+    PASSWORD_SALT_LENGTH = 16
+    HASH_WORKERS = 2
+    HASH_QUEUE_LIMIT = 16
+
+    # Login throttling (token buckets): burst size and refill rate per client IP, and per
+    # (username, client IP) for failed attempts only
+    LOGIN_IP_BURST = 20
+    LOGIN_IP_PER_MINUTE = 10
+    LOGIN_USER_BURST = 5
+    LOGIN_USER_PER_MINUTE = 1
+
+    # Instrumentation: per-endpoint metrics at /admin/metrics (admin session or
+    # 'Authorization: Bearer <METRICS_TOKEN>'), slow-request log and N+1 warnings
+    METRICS_ENABLED = True
+    METRICS_TOKEN = None
+    METRICS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+    SLOW_REQUEST_MS = 500
+    SLOW_REQUEST_LOG = None
+    N_PLUS_ONE_THRESHOLD = 5
+
+    # Post analytics: views and daily like/comment/bookmark changes are tallied in memory
+    # and written every STATS_FLUSH_INTERVAL_MS (see PostStatsBuffer in main.py)
+    STATS_FLUSH_INTERVAL_MS = 5000
+    ANALYTICS_DAYS = 30
+
+    # Trending: posts rank by weighted engagement halved every TRENDING_HALF_LIFE_HOURS of
+    # age. Each process rescores the posts it saw change every TRENDING_REFRESH_SECONDS
+    # (0 = never); 'flask refresh-trending' from cron does a full diff of every post
+    TRENDING_WEIGHTS = {'views': 0.05, 'likes': 1, 'comments': 2, 'bookmarks': 3}
+    TRENDING_HALF_LIFE_HOURS = 36
+    TRENDING_REFRESH_SECONDS = 60
+
+    # Write-behind buffering for like/bookmark toggles (see InteractionBuffer in main.py)
+    WRITE_BEHIND_ENABLED = False
+    WRITE_BEHIND_INTERVAL_MS = 200
+    WRITE_BEHIND_JOURNAL = None
+
+    # SQLite connection tuning (applied as PRAGMAs on every new connection)
+    SQLITE_JOURNAL_MODE = 'WAL'
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB = 64 * 1024
+
+    # Connection pool (SQLAlchemy QueuePool)
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 1800
@@ -0,0 +1,35 @@
+"""Gunicorn settings for wsgi:application.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+    GUNICORN_WORKERS=4 GUNICORN_THREADS=8 gunicorn -c gunicorn.conf.py wsgi:application
+
+Defaults to threaded workers (gthread): requests mostly wait on SQLite/Postgres or on the
+password hashing pool, so a few processes with several threads each use less memory than
+many single-threaded processes. Caches, the view/like buffers and login throttles are
+per process; with WRITE_BEHIND_ENABLED run a single worker (see main.py).
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so a slow leak can't grow without bound
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+# Each worker imports wsgi itself, so its connection pool and background threads are its own
+preload_app = False
+
+
+def on_starting(server):
+    # Migrate once in the master before any worker starts, instead of every worker racing to
+    from main import app, db, upgrade_database
+    with app.app_context():
+        for name in upgrade_database(): server.log.info('Applied migration %s', name)
+        db.engine.dispose()  # don't hand the master's connections to forked workers
+    app.config['SCHEMA_ON_STARTUP'] = False
@@ -0,0 +1,160 @@
+"""Read throughput under concurrent load, comparing two configurations per scenario.
+
+    python loadtest.py                                  # 'writes': like-toggle writers, before/after SQLite tuning
+    python loadtest.py --scenario login-attack          # failed-login burst, without/with hashing limits and throttling
+    python loadtest.py --profile after --readers 8 --writers 4 --seconds 10
+
+Each profile runs in a fresh process against a throwaway database, so the settings
+are picked up through the same BLOG_* environment overrides production uses. In the
+login-attack scenario --writers is the number of attacking clients, each on its own IP.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+# scenario -> profile -> environment overrides; the last profile of each is the config.py default
+SCENARIOS = {
+    # 'before' reproduces SQLite's stock rollback journal
+    'writes': {
+        'before': {'BLOG_SQLITE_JOURNAL_MODE': 'DELETE', 'BLOG_SQLITE_SYNCHRONOUS': 'FULL', 'BLOG_SQLITE_MMAP_SIZE': '0'},
+        'after': {},
+    },
+    # 'unthrottled' lets every attacker hash concurrently, like the old inline check_password_hash
+    'login-attack': {
+        'unthrottled': {'BLOG_HASH_WORKERS': '64', 'BLOG_HASH_QUEUE_LIMIT': '1000', 'BLOG_LOGIN_IP_BURST': '1000000',
+                        'BLOG_LOGIN_USER_BURST': '1000000'},
+        'throttled': {},
+    },
+}
+COLUMNS = {
+    'writes': ['profile', 'journal_mode', 'reads_per_sec', 'read_p50_ms', 'read_p99_ms', 'read_errors', 'writes_per_sec',
+               'write_p99_ms', 'write_errors'],
+    'login-attack': ['profile', 'reads_per_sec', 'read_p50_ms', 'read_p99_ms', 'read_errors', 'logins_per_sec',
+                     'throttled_per_sec', 'shed_per_sec', 'login_p99_ms'],
+}
+
+
+def percentile(samples, pct):
+    if not samples: return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_single(args):
+    workdir = tempfile.mkdtemp(prefix='blog-loadtest-')
+    os.environ['BLOG_SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(workdir, "load.db")}'
+    os.environ.update(SCENARIOS[args.scenario][args.profile])
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    import main
+    main.app.logger.setLevel(logging.CRITICAL)
+
+    with main.app.app_context():
+        main.upgrade_database()
+        password = main.generate_password_hash('secret', main.app.config['PASSWORD_HASH_METHOD'])
+        writer = main.User(username='loadwriter', password=password, role='writer')
+        users = [main.User(username=f'load{i}', password=password) for i in range(args.writers)]
+        main.db.session.add_all([writer] + users)
+        main.db.session.flush()
+        posts = [main.BlogPost(title=f'Load post {i}', excerpt='excerpt', content='body ' * 200, category='Load',
+                               status='active', author=writer) for i in range(args.posts)]
+        main.db.session.add_all(posts)
+        main.db.session.commit()
+        post_ids, user_ids = [p.id for p in posts], [u.id for u in users]
+        usernames = [u.username for u in users]
+
+    stop = threading.Event()
+    reads, writes, read_errors, write_errors = [], [], [0], [0]
+    login_statuses = []
+    lock = threading.Lock()
+
+    def reader():
+        client = main.app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            status = client.get(f'/post/{random.choice(post_ids)}').status_code
+            with lock:
+                if status == 200: reads.append(time.perf_counter() - start)
+                else: read_errors[0] += 1
+
+    def writer_loop(user_id):
+        client = main.app.test_client()
+        with client.session_transaction() as sess: sess['_user_id'] = str(user_id)
+        while not stop.is_set():
+            start = time.perf_counter()
+            status = client.post(f'/api/like-post/{random.choice(post_ids)}').status_code
+            with lock:
+                if status == 200: writes.append(time.perf_counter() - start)
+                else: write_errors[0] += 1
+
+    def attacker(index):
+        client = main.app.test_client()
+        environ = {'REMOTE_ADDR': f'10.{index // 250}.{index % 250}.1'}
+        while not stop.is_set():
+            start = time.perf_counter()
+            status = client.post('/login', data={'username': random.choice(usernames), 'password': 'guess'}, environ_base=environ).status_code
+            with lock: login_statuses.append((status, time.perf_counter() - start))
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    if args.scenario == 'login-attack': threads += [threading.Thread(target=attacker, args=(i,)) for i in range(args.writers)]
+    else: threads += [threading.Thread(target=writer_loop, args=(uid,)) for uid in user_ids]
+    for t in threads: t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads: t.join()
+
+    hashed = [elapsed for status, elapsed in login_statuses if status == 200]
+    return {'scenario': args.scenario, 'profile': args.profile, 'journal_mode': main.app.config['SQLITE_JOURNAL_MODE'],
+            'reads_per_sec': len(reads) / args.seconds, 'read_p50_ms': percentile(reads, 50) * 1000,
+            'read_p99_ms': percentile(reads, 99) * 1000, 'read_errors': read_errors[0], 'writes_per_sec': len(writes) / args.seconds,
+            'write_p99_ms': percentile(writes, 99) * 1000, 'write_errors': write_errors[0],
+            'logins_per_sec': len(hashed) / args.seconds, 'login_p99_ms': percentile(hashed, 99) * 1000,
+            'throttled_per_sec': sum(status == 429 for status, _ in login_statuses) / args.seconds,
+            'shed_per_sec': sum(status == 503 for status, _ in login_statuses) / args.seconds}
+
+
+def print_table(results):
+    columns = COLUMNS[results[0]['scenario']]
+    print('  '.join(f'{c:>14}' for c in columns))
+    for row in results:
+        print('  '.join(f'{row[c]:>14.1f}' if isinstance(row[c], float) else f'{row[c]:>14}' for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=SCENARIOS, default='writes')
+    parser.add_argument('--profile', help='Run a single profile of the scenario instead of the comparison.')
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--json', action='store_true', help='Print the raw result as JSON.')
+    args = parser.parse_args()
+
+    if args.profile and args.profile not in SCENARIOS[args.scenario]:
+        parser.error(f"--profile must be one of: {', '.join(SCENARIOS[args.scenario])}")
+    if args.profile:
+        result = run_single(args)
+        if args.json: print(json.dumps(result))
+        else: print_table([result])
+        return
+
+    results = []
+    for profile in SCENARIOS[args.scenario]:
+        cmd = [sys.executable, os.path.abspath(__file__), '--scenario', args.scenario, '--profile', profile, '--json', '--readers', str(args.readers),
+               '--writers', str(args.writers), '--seconds', str(args.seconds), '--posts', str(args.posts)]
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,74 @@
 import os
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify
+import re
+import pickle
+import mimetypes
+import hashlib
+import tempfile
+import json
+import atexit
+import sqlite3
+import base64
+import time
+import threading
+import logging
+import click
+from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, abort, send_from_directory, g, has_request_context
+from flask import get_flashed_messages
+from flask import before_render_template, template_rendered, stream_template
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from sqlalchemy import func, desc
-from datetime import datetime
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+from sqlalchemy import func, select, update, event, tuple_, or_, bindparam
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.orm import load_only, joinedload, make_transient_to_detached
+from functools import partial
+from collections import Counter, OrderedDict
+from markupsafe import Markup
+from werkzeug.utils import import_string
+from werkzeug.middleware.proxy_fix import ProxyFix
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from math import ceil, log2
+from bisect import bisect_left
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: without it no variants are built and originals are served
+    Image = ImageOps = None
 
 # --- CONFIGURATION ---
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'supersecretkey'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///blog.db'
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif'}
+app.config.from_object('config.Config')
+app.config.from_envvar('BLOG_SETTINGS', silent=True)
+app.config.from_prefixed_env('BLOG')
+# Behind nginx or a load balancer, take the client address (and scheme) from X-Forwarded-*
+if app.config['PROXY_FIX_X_FOR'] or app.config['PROXY_FIX_X_PROTO']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'], x_proto=app.config['PROXY_FIX_X_PROTO'])
+
+def engine_options(config):
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri in ('sqlite://', 'sqlite:///') or ':memory:' in uri: return {}
+    pool = {'pool_size': config['DB_POOL_SIZE'], 'max_overflow': config['DB_MAX_OVERFLOW'], 'pool_timeout': config['DB_POOL_TIMEOUT']}
+    if uri.startswith('sqlite'):
+        return dict(pool, connect_args={'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000, 'check_same_thread': False})
+    return dict(pool, pool_recycle=config['DB_POOL_RECYCLE'], pool_pre_ping=True)
+
+app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a writer commits; busy_timeout waits out the writer lock
+    if not isinstance(dbapi_connection, sqlite3.Connection): return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode = {app.config['SQLITE_JOURNAL_MODE']}")
+    cursor.execute(f"PRAGMA synchronous = {app.config['SQLITE_SYNCHRONOUS']}")
+    cursor.execute(f"PRAGMA busy_timeout = {int(app.config['SQLITE_BUSY_TIMEOUT_MS'])}")
+    cursor.execute(f"PRAGMA mmap_size = {int(app.config['SQLITE_MMAP_SIZE'])}")
+    cursor.execute(f"PRAGMA cache_size = -{int(app.config['SQLITE_CACHE_SIZE_KB'])}")
+    cursor.execute('PRAGMA temp_store = MEMORY')
+    cursor.close()
 
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
@@ -25,21 +81,147 @@ login_manager.login_view = 'login'
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+# --- UPLOAD PIPELINE ---
+# Uploads are streamed to disk while being hashed and stored once under their content hash,
+# so identical files dedupe and different files never overwrite each other. Resized WebP
+# variants are built by a background pool; upload_url() serves a variant once it exists
+# and the original until then.
+IMAGE_VARIANTS = {
+    # name: ((width, height), crop to fill)
+    'avatar': ((128, 128), True),
+    'card': ((800, 450), True),
+    'banner': ((1280, 544), True),
+    'large': ((1600, 1600), False),
+}
+image_pool = ThreadPoolExecutor(max_workers=app.config['IMAGE_WORKERS'], thread_name_prefix='image-variants')
+_known_variants = set()
+
+def variant_filename(filename, variant):
+    return f"{filename.rsplit('.', 1)[0]}.{variant}.webp"
+
+def build_variants(path, variants):
+    if Image is None: return
+    try:
+        with Image.open(path) as original:
+            source = ImageOps.exif_transpose(original)
+            source = source.convert('RGBA' if 'A' in source.getbands() else 'RGB')
+            for variant in variants:
+                (width, height), crop = IMAGE_VARIANTS[variant]
+                target = os.path.join(os.path.dirname(path), variant_filename(os.path.basename(path), variant))
+                if os.path.exists(target): continue
+                if crop:
+                    image = ImageOps.fit(source, (width, height), Image.LANCZOS)
+                else:
+                    image = source.copy()
+                    image.thumbnail((width, height), Image.LANCZOS)
+                image.save(target + '.part', 'WEBP', quality=app.config['IMAGE_QUALITY'], method=4)
+                os.replace(target + '.part', target)
+    except Exception:
+        app.logger.exception('Could not build image variants for %s', path)
+
+def store_upload(file, *variants):
+    # Returns the stored filename, or None when there is no acceptable file
+    if not file or not allowed_file(file.filename): return None
+    folder = app.config['UPLOAD_FOLDER']
+    digest = hashlib.sha256()
+    fd, part_path = tempfile.mkstemp(dir=folder, suffix='.part')
+    with os.fdopen(fd, 'wb') as out:
+        for chunk in iter(lambda: file.stream.read(64 * 1024), b''):
+            digest.update(chunk)
+            out.write(chunk)
+    filename = f"{digest.hexdigest()[:32]}.{file.filename.rsplit('.', 1)[1].lower()}"
+    path = os.path.join(folder, filename)
+    if os.path.exists(path): os.remove(part_path)
+    else: os.replace(part_path, path)
+    image_pool.submit(build_variants, path, variants or tuple(IMAGE_VARIANTS))
+    return filename
+
+@app.template_global()
+def upload_url(filename, variant=None):
+    if variant:
+        name = variant_filename(filename, variant)
+        if name in _known_variants or os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], name)):
+            _known_variants.add(name)
+            filename = name
+    return url_for('media', version=media_version(filename), filename=filename)
+
+# --- MEDIA SERVING ---
+# Uploads are served from /media/<version>/<name>. Content-hashed names carry their own
+# version; legacy names are versioned by mtime and size. The URL changes whenever the bytes
+# do, so responses are cached as immutable and browsers never revalidate them.
+HASHED_NAME = re.compile(r'^([0-9a-f]{32})\.')
+_media_versions = {}
+
+def media_version(filename):
+    version = _media_versions.get(filename)
+    if version is None:
+        # Only files that exist are remembered, so requests for made-up names can't grow the cache
+        path = safe_join(app.config['UPLOAD_FOLDER'], filename)
+        if path is None or not os.path.isfile(path): return '0'
+        match = HASHED_NAME.match(filename)
+        if match:
+            version = match.group(1)[:12]
+        else:
+            try: stat = os.stat(path)
+            except OSError: return '0'
+            version = f'{stat.st_mtime_ns:x}{stat.st_size:x}'
+        _media_versions[filename] = version
+    return version
+
+@app.route('/media/<version>/<path:filename>')
+def media(version, filename):
+    folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+    current = version == media_version(filename)
+    max_age = app.config['MEDIA_MAX_AGE'] if current else 60
+    accel_prefix = app.config['X_ACCEL_REDIRECT_PREFIX']
+    if accel_prefix:
+        # nginx streams the file (and handles Range/ETag); we only authorize and set headers
+        path = safe_join(folder, filename)
+        if path is None or not os.path.isfile(path): abort(404)
+        response = app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + filename
+        response.cache_control.max_age = max_age
+    else:
+        # Werkzeug answers If-None-Match and Range itself; USE_X_SENDFILE hands the body to the server
+        etag = filename if HASHED_NAME.match(filename) else True
+        response = send_from_directory(folder, filename, conditional=True, etag=etag, max_age=max_age)
+    response.cache_control.public = True
+    response.cache_control.immutable = current or None
+    return response
+
+@app.cli.command('build-image-variants')
+def build_image_variants_command():
+    """Generate any missing resized variants for files already in the upload folder."""
+    if Image is None: raise click.ClickException('Pillow is not installed.')
+    folder = app.config['UPLOAD_FOLDER']
+    originals = [name for name in os.listdir(folder) if allowed_file(name) and not name.endswith('.part')]
+    for name in originals: build_variants(os.path.join(folder, name), tuple(IMAGE_VARIANTS))
+    click.echo(f'Checked variants for {len(originals)} uploads.')
+
 # --- DATABASE MODELS ---
 
+# Association tables are keyed on (user, item) so a user can like/bookmark an item once;
+# the item-side index serves counter reconciliation and cascade deletes.
 bookmarks = db.Table('bookmarks',
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('post_id', db.Integer, db.ForeignKey('blog_post.id'))
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('post_id', db.Integer, db.ForeignKey('blog_post.id'), primary_key=True),
+    db.Index('ix_bookmarks_post_id', 'post_id')
 )
 
 post_likes = db.Table('post_likes',
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('post_id', db.Integer, db.ForeignKey('blog_post.id'))
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('post_id', db.Integer, db.ForeignKey('blog_post.id'), primary_key=True),
+    db.Index('ix_post_likes_post_id', 'post_id')
 )
 
 comment_likes = db.Table('comment_likes',
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('comment_id', db.Integer, db.ForeignKey('comment.id'))
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('comment_id', db.Integer, db.ForeignKey('comment.id'), primary_key=True),
+    db.Index('ix_comment_likes_comment_id', 'comment_id')
+)
+
+schema_version = db.Table('schema_version',
+    db.Column('version', db.Integer, nullable=False)
 )
 
 # ✅ REPORT MODELS
@@ -50,6 +232,8 @@ class PostReport(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('blog_post.id'), nullable=False)
 
+    __table_args__ = (db.Index('ix_post_report_post_id', 'post_id'), db.Index('ix_post_report_user_post', 'user_id', 'post_id'))
+
 class CommentReport(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     reason = db.Column(db.String(100), nullable=False)
@@ -57,6 +241,28 @@ class CommentReport(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     comment_id = db.Column(db.Integer, db.ForeignKey('comment.id'), nullable=False)
 
+    __table_args__ = (db.Index('ix_comment_report_comment_id', 'comment_id'), db.Index('ix_comment_report_user_comment', 'user_id', 'comment_id'))
+
+# One row per reported post/comment, maintained as reports arrive so the admin queue
+# never has to aggregate the raw report tables
+class ModerationQueue(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    target_type = db.Column(db.String(10), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    report_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    first_reported = db.Column(db.DateTime, nullable=False)
+    last_reported = db.Column(db.DateTime, nullable=False)
+    reasons = db.Column(db.Text, default='[]', nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('target_type', 'target_id', name='uq_moderation_queue_target'),
+                      db.Index('ix_moderation_queue_count', 'target_type', 'report_count', 'id'),
+                      db.Index('ix_moderation_queue_last', 'target_type', 'last_reported', 'id'),
+                      db.Index('ix_moderation_queue_first', 'target_type', 'first_reported', 'id'))
+
+    @property
+    def reason_list(self):
+        return json.loads(self.reasons)
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
@@ -88,9 +294,26 @@ class BlogPost(db.Model):
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     author = db.relationship('User', backref=db.backref('posts', lazy=True))
 
+    # Denormalized counters (kept in sync by the toggle/comment routes)
+    like_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    comment_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    bookmark_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # Bumped whenever the cached article/comment fragments for this post go stale
+    cache_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # Batched by post_stats, so it trails live traffic by up to STATS_FLUSH_INTERVAL_MS
+    view_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
     # Reports relation
-    comments = db.relationship('Comment', backref='post', cascade="all, delete", lazy=True)
+    # Threads can be huge; read them a page at a time through comments_page()
+    comments = db.relationship('Comment', backref='post', cascade="all, delete", lazy='dynamic')
     reports = db.relationship('PostReport', backref='post', cascade="all, delete", lazy=True)
+    daily_stats = db.relationship('PostDailyStats', cascade="all, delete", lazy='dynamic')
+
+    # Feed keyset (status, date_posted, id), per-author listings and homepage category rows
+    __table_args__ = (db.Index('ix_blog_post_status_date_id', 'status', 'date_posted', 'id'),
+                      db.Index('ix_blog_post_author_status_date', 'author_id', 'status', 'date_posted'),
+                      db.Index('ix_blog_post_author_date_id', 'author_id', 'date_posted', 'id'),
+                      db.Index('ix_blog_post_category_status_date', 'category', 'status', 'date_posted'))
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -99,13 +322,76 @@ class Comment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     author = db.relationship('User', backref='comments')
     post_id = db.Column(db.Integer, db.ForeignKey('blog_post.id'), nullable=False)
+    like_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
 
     # Reports relation
     reports = db.relationship('CommentReport', backref='comment', cascade="all, delete", lazy=True)
 
+    __table_args__ = (db.Index('ix_comment_post_date_id', 'post_id', 'date_posted', 'id'), db.Index('ix_comment_user_id', 'user_id'))
+
+# Per-post activity by UTC day for the writer analytics page: views, and the net change in
+# likes, comments and bookmarks. Written in batches by post_stats, never per request.
+class PostDailyStats(db.Model):
+    post_id = db.Column(db.Integer, db.ForeignKey('blog_post.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    likes = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    comments = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    bookmarks = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+# Precomputed trending ranks (see TRENDING): one row per active post and per writer with
+# any, read top-N straight off the score index. Rows for deleted or unpublished posts are
+# dropped by the next refresh; readers join on status='active' meanwhile.
+class PostScore(db.Model):
+    post_id = db.Column(db.Integer, primary_key=True)
+    author_id = db.Column(db.Integer, nullable=False)
+    engagement = db.Column(db.Float, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (db.Index('ix_post_score_score', 'score', 'post_id'), db.Index('ix_post_score_author', 'author_id', 'score'))
+
+class WriterScore(db.Model):
+    user_id = db.Column(db.Integer, primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (db.Index('ix_writer_score_score', 'score', 'user_id'),)
+
+# --- QUERY PROFILES ---
+# Named loading strategies for BlogPost listings; templates must only touch what the profile loads
+AUTHOR_CARD = joinedload(BlogPost.author).load_only(User.id, User.username, User.profile_pic)
+POST_PROFILES = {
+    'card': (load_only(BlogPost.id, BlogPost.title, BlogPost.excerpt, BlogPost.thumbnail, BlogPost.trending_thumbnail,
+                       BlogPost.category, BlogPost.status, BlogPost.date_posted, BlogPost.author_id,
+                       BlogPost.like_count, BlogPost.comment_count, BlogPost.bookmark_count), AUTHOR_CARD),
+    'detail': (joinedload(BlogPost.author),),
+    'admin': (load_only(BlogPost.id, BlogPost.title, BlogPost.excerpt, BlogPost.thumbnail, BlogPost.category,
+                        BlogPost.status, BlogPost.date_posted, BlogPost.author_id), AUTHOR_CARD),
+    'writer': (load_only(BlogPost.id, BlogPost.title, BlogPost.excerpt, BlogPost.thumbnail, BlogPost.category,
+                         BlogPost.status, BlogPost.date_posted, BlogPost.author_id,
+                         BlogPost.view_count, BlogPost.like_count, BlogPost.comment_count, BlogPost.bookmark_count),),
+}
+
+def post_query(profile='card'):
+    return BlogPost.query.options(*POST_PROFILES[profile])
+
+# The logged-in user's row is cached for USER_CACHE_TTL so most requests never touch the
+# user table; routes that change a user call invalidate_user() once they commit.
+USER_CACHE_FIELDS = [c.key for c in User.__table__.columns if c.key != 'password']
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    row = cache.get(f'user:{user_id}')
+    if row is None:
+        user = db.session.get(User, int(user_id))
+        if user is not None: cache.set(f'user:{user_id}', {f: getattr(user, f) for f in USER_CACHE_FIELDS}, app.config['USER_CACHE_TTL'])
+        return user
+    # Rebuild a persistent instance from the cached row without a SELECT; password stays unloaded
+    user = User(**row)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+def invalidate_user(user_id):
+    cache.delete(f'user:{user_id}')
 
 @app.context_processor
 def inject_layout():
@@ -116,52 +402,1091 @@ def inject_layout():
     elif current_user.role == 'admin': return dict(layout='base_admin.html')
     else: return dict(layout='base_user.html')
 
+# --- COUNTERS ---
+# kind -> (association table, item column, counter model, counter column)
+INTERACTIONS = {
+    'bookmark': (bookmarks, 'post_id', BlogPost, 'bookmark_count'),
+    'post_like': (post_likes, 'post_id', BlogPost, 'like_count'),
+    'comment_like': (comment_likes, 'comment_id', Comment, 'like_count'),
+}
+
+def association_exists(executor, table, item_key, user_id, item_id):
+    match = (table.c.user_id == user_id) & (table.c[item_key] == item_id)
+    return executor.execute(select(table.c.user_id).where(match).limit(1)).first() is not None
+
+def insert_ignoring_duplicates(table):
+    if db.engine.dialect.name == 'sqlite': return sqlite_insert(table).on_conflict_do_nothing()
+    if db.engine.dialect.name == 'postgresql': return postgresql_insert(table).on_conflict_do_nothing()
+    return table.insert().prefix_with('IGNORE')
+
+def toggle_association(table, item_key, item_id):
+    # Flip the (current_user, item) row in an association table; returns (now_set, changed).
+    # Two taps racing on the same row both see the same state, so the loser changes nothing.
+    match = (table.c.user_id == current_user.id) & (table.c[item_key] == item_id)
+    if association_exists(db.session, table, item_key, current_user.id, item_id):
+        return False, db.session.execute(table.delete().where(match)).rowcount > 0
+    return True, db.session.execute(insert_ignoring_duplicates(table).values(user_id=current_user.id, **{item_key: item_id})).rowcount > 0
+
+def bump_counter(model, column, item_id, delta):
+    # Atomic in-SQL increment so concurrent requests never lose updates
+    db.session.execute(update(model).where(model.id == item_id).values({column: getattr(model, column) + delta}))
+
+def counter_reconcile_statements():
+    def tally(table, key, target):
+        return select(func.count()).select_from(table).where(table.c[key] == target.id).scalar_subquery()
+    return [update(BlogPost).values(
+                like_count=tally(post_likes, 'post_id', BlogPost),
+                bookmark_count=tally(bookmarks, 'post_id', BlogPost),
+                comment_count=select(func.count(Comment.id)).where(Comment.post_id == BlogPost.id).scalar_subquery()),
+            update(Comment).values(like_count=tally(comment_likes, 'comment_id', Comment))]
+
+def reconcile_counters():
+    for statement in counter_reconcile_statements(): db.session.execute(statement)
+    db.session.commit()
+
+@app.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Rebuild like/comment/bookmark counters from the association tables."""
+    reconcile_counters()
+    click.echo('Counters reconciled.')
+
+def read_counter(model, column, item_id):
+    return db.session.execute(select(getattr(model, column)).where(model.id == item_id)).scalar() or 0
+
+def toggle_interaction(kind, item_id, post_id=None):
+    # Returns (now_set, count); buffered when write-behind mode is on
+    if app.config['WRITE_BEHIND_ENABLED']:
+        return interaction_buffer.toggle(kind, current_user.id, item_id)
+    table, item_key, model, column = INTERACTIONS[kind]
+    added, changed = toggle_association(table, item_key, item_id)
+    if changed: bump_counter(model, column, item_id, 1 if added else -1)
+    if changed and kind == 'comment_like': bump_counter(BlogPost, 'cache_version', post_id, 1)
+    db.session.commit()
+    if changed and kind in STAT_COLUMNS: post_stats.record(item_id, **{STAT_COLUMNS[kind]: 1 if added else -1})
+    return added, read_counter(model, column, item_id)
+
+# --- POST STATS ---
+# post_detail hits and like/comment/bookmark changes are tallied in memory per (post, day)
+# and written every STATS_FLUSH_INTERVAL_MS in one transaction: one view_count increment
+# and one PostDailyStats upsert per post touched, however many hits it had. Each process
+# keeps its own tally and the writes are additive, so any number of workers can run.
+# A hard crash loses at most one interval of views; a clean exit flushes (atexit).
+STAT_COLUMNS = {'post_like': 'likes', 'bookmark': 'bookmarks'}
+ANALYTICS_COLUMNS = ('views', 'likes', 'comments', 'bookmarks')
+ANALYTICS_RANGES = (7, 30, 90)
+POST_STATUSES = ('active', 'pending', 'draft', 'rejected')
+
+class PostStatsBuffer:
+    def __init__(self):
+        self._pending = {}          # (post_id, day) -> Counter of column deltas
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def record(self, post_id, **deltas):
+        self.start()
+        with self._lock:
+            self._pending.setdefault((post_id, datetime.utcnow().date()), Counter()).update(deltas)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending: return 0
+        stats, views, touched = PostDailyStats.__table__, 0, set()
+        try:
+            with db.engine.begin() as conn:
+                # Posts deleted since the hit are skipped rather than failing the batch
+                live = set(conn.scalars(select(BlogPost.id).where(BlogPost.id.in_({post_id for post_id, _ in pending}))))
+                for (post_id, day), deltas in sorted(pending.items()):
+                    if post_id not in live or not any(deltas.values()): continue
+                    views += deltas['views']
+                    touched.add(post_id)
+                    if deltas['views']: conn.execute(update(BlogPost).where(BlogPost.id == post_id).values(view_count=BlogPost.view_count + deltas['views']))
+                    conn.execute(insert_ignoring_duplicates(stats).values(post_id=post_id, day=day))
+                    conn.execute(update(stats).where(stats.c.post_id == post_id, stats.c.day == day)
+                                 .values({column: stats.c[column] + delta for column, delta in deltas.items() if delta}))
+        except Exception:
+            with self._lock:
+                for key, deltas in pending.items(): self._pending.setdefault(key, Counter()).update(deltas)
+            raise
+        if touched: trending_job.mark(*touched)
+        return views
+
+    def start(self):
+        if self._thread is not None or self._stop.is_set(): return
+        with self._lock:
+            if self._thread is not None: return
+            self._thread = threading.Thread(target=self._run, name='post-stats-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(app.config['STATS_FLUSH_INTERVAL_MS'] / 1000):
+            with app.app_context():
+                try: self.flush()
+                except Exception: app.logger.exception('Post stats flush failed; will retry')
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None: self._thread.join(timeout=5)
+        with app.app_context(): self.flush()
+
+post_stats = PostStatsBuffer()
+# Registered before interaction_buffer so this exit flush runs after its one (atexit is LIFO)
+atexit.register(post_stats.shutdown)
+
+def post_analytics_series(post_id, days):
+    # One row per day for the last `days` days, zero-filled where nothing happened
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    rows = {row.day: row for row in PostDailyStats.query.filter(PostDailyStats.post_id == post_id, PostDailyStats.day >= start)}
+    series = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = rows.get(day)
+        series.append({'day': day, **{column: getattr(row, column) if row else 0 for column in ANALYTICS_COLUMNS}})
+    return series
+
+# --- WRITE-BEHIND INTERACTIONS ---
+# With WRITE_BEHIND_ENABLED, like/bookmark taps are recorded as the wanted final state per
+# (kind, user, item) and written to the association tables in one transaction every
+# WRITE_BEHIND_INTERVAL_MS. Re-toggling before a flush collapses to a single write (or none).
+# Durability: without a journal, a hard crash loses at most one interval of taps; a clean
+# exit always flushes (atexit). With WRITE_BEHIND_JOURNAL set, each tap is appended to that
+# file before the response and replayed on the next start, so only an OS crash before the
+# page cache reaches disk can lose taps. The buffer is per process: run one worker, or route
+# a user's requests to the same worker, when it is enabled.
+class InteractionBuffer:
+    def __init__(self):
+        self._pending = {}          # (kind, user_id, item_id) -> [stored, wanted]
+        self._deltas = Counter()    # (kind, item_id) -> unflushed counter change
+        self._lock = threading.RLock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def toggle(self, kind, user_id, item_id):
+        table, item_key, model, column = INTERACTIONS[kind]
+        self.start()
+        with self._lock:
+            key = (kind, user_id, item_id)
+            entry = self._pending.get(key)
+            if entry is None:
+                stored = association_exists(db.session, table, item_key, user_id, item_id)
+                entry = self._pending[key] = [stored, stored]
+            entry[1] = not entry[1]
+            self._deltas[(kind, item_id)] += 1 if entry[1] else -1
+            wanted = entry[1]
+            if entry[0] == wanted: del self._pending[key]
+            self._journal({'kind': kind, 'user_id': user_id, 'item_id': item_id, 'wanted': wanted})
+            count = read_counter(model, column, item_id) + self._deltas[(kind, item_id)]
+        return wanted, count
+
+    def pending_for(self, user_id):
+        with self._lock:
+            return {(kind, item_id): wanted for (kind, uid, item_id), (_, wanted) in self._pending.items() if uid == user_id}
+
+    def flush(self):
+        # Holding the lock across the write keeps stored-state lookups and optimistic counts exact
+        with self._lock:
+            if not self._pending: return 0
+            applied = Counter()
+            with db.engine.begin() as conn:
+                for (kind, user_id, item_id), (_, wanted) in self._pending.items():
+                    table, item_key, model, column = INTERACTIONS[kind]
+                    exists = association_exists(conn, table, item_key, user_id, item_id)
+                    if wanted and not exists:
+                        conn.execute(table.insert().values(user_id=user_id, **{item_key: item_id}))
+                        applied[(kind, item_id)] += 1
+                    elif not wanted and exists:
+                        match = (table.c.user_id == user_id) & (table.c[item_key] == item_id)
+                        conn.execute(table.delete().where(match))
+                        applied[(kind, item_id)] -= 1
+                for (kind, item_id), delta in applied.items():
+                    _, _, model, column = INTERACTIONS[kind]
+                    if delta: conn.execute(update(model).where(model.id == item_id).values({column: getattr(model, column) + delta}))
+                    if delta and kind == 'comment_like':
+                        post_id = select(Comment.post_id).where(Comment.id == item_id).scalar_subquery()
+                        conn.execute(update(BlogPost).where(BlogPost.id == post_id).values(cache_version=BlogPost.cache_version + 1))
+            for (kind, item_id), delta in applied.items():
+                if delta and kind in STAT_COLUMNS: post_stats.record(item_id, **{STAT_COLUMNS[kind]: delta})
+            flushed = len(self._pending)
+            self._pending, self._deltas = {}, Counter()
+            journal = app.config['WRITE_BEHIND_JOURNAL']
+            if journal and os.path.exists(journal): open(journal, 'w').close()
+            return flushed
+
+    def _journal(self, record):
+        journal = app.config['WRITE_BEHIND_JOURNAL']
+        if not journal: return
+        with open(journal, 'a') as fh: fh.write(json.dumps(record) + '\n')
+
+    def recover(self):
+        # Replay the journal left by a crashed process; wanted states are absolute, so replay is idempotent
+        journal = app.config['WRITE_BEHIND_JOURNAL']
+        if not journal or not os.path.exists(journal): return 0
+        with self._lock:
+            with open(journal) as fh:
+                for line in fh:
+                    try: record = json.loads(line)
+                    except ValueError: continue  # torn final line from the crash
+                    key = (record['kind'], record['user_id'], record['item_id'])
+                    self._pending[key] = [None, record['wanted']]
+            return self.flush()
+
+    def start(self):
+        if self._thread is not None: return
+        with self._lock:
+            if self._thread is not None: return
+            self.recover()
+            self._thread = threading.Thread(target=self._run, name='interaction-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(app.config['WRITE_BEHIND_INTERVAL_MS'] / 1000):
+            with app.app_context():
+                try: self.flush()
+                except Exception: app.logger.exception('Write-behind flush failed; will retry')
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None: self._thread.join(timeout=5)
+        with app.app_context(): self.flush()
+
+interaction_buffer = InteractionBuffer()
+atexit.register(interaction_buffer.shutdown)
+
+@app.cli.command('flush-interactions')
+def flush_interactions_command():
+    """Replay a write-behind journal left by a crashed worker into the database."""
+    click.echo(f'Flushed {interaction_buffer.recover()} pending interactions.')
+
+# --- MODERATION QUEUE ---
+# target type -> (report model, target column)
+REPORT_SOURCES = {'post': (PostReport, 'post_id'), 'comment': (CommentReport, 'comment_id')}
+QUEUE_SORTS = {
+    'count': (ModerationQueue.report_count.desc(), ModerationQueue.id.desc()),
+    'recent': (ModerationQueue.last_reported.desc(), ModerationQueue.id.desc()),
+    'oldest': (ModerationQueue.first_reported, ModerationQueue.id),
+}
+
+def enqueue_report(target_type, target_id, reason, reported_at):
+    entry = ModerationQueue.query.filter_by(target_type=target_type, target_id=target_id).first()
+    if entry is None:
+        db.session.add(ModerationQueue(target_type=target_type, target_id=target_id, report_count=1, first_reported=reported_at,
+                                       last_reported=reported_at, reasons=json.dumps([reason])))
+        return
+    entry.report_count = ModerationQueue.report_count + 1
+    entry.last_reported = reported_at
+    if reason not in entry.reason_list: entry.reasons = json.dumps(entry.reason_list + [reason])
+
+def clear_moderation(target_type, *target_ids):
+    ModerationQueue.query.filter(ModerationQueue.target_type == target_type, ModerationQueue.target_id.in_(target_ids)).delete(synchronize_session=False)
+
+def clear_post_moderation(post_id):
+    # A deleted post takes its comments with it, so their queue rows go too
+    clear_moderation('post', post_id)
+    ModerationQueue.query.filter(ModerationQueue.target_type == 'comment',
+                                 ModerationQueue.target_id.in_(select(Comment.id).where(Comment.post_id == post_id))).delete(synchronize_session=False)
+
+def rebuild_moderation_queue(executor):
+    executor.execute(ModerationQueue.__table__.delete())
+    for target_type, (model, key) in REPORT_SOURCES.items():
+        target = getattr(model, key)
+        reasons = {}
+        first_seen = func.min(model.timestamp)
+        for target_id, reason, _ in executor.execute(select(target, model.reason, first_seen).group_by(target, model.reason).order_by(target, first_seen)):
+            reasons.setdefault(target_id, []).append(reason)
+        rows = [{'target_type': target_type, 'target_id': target_id, 'report_count': count, 'first_reported': first,
+                 'last_reported': last, 'reasons': json.dumps(reasons.get(target_id, []))}
+                for target_id, count, first, last in executor.execute(
+                    select(target, func.count(), func.min(model.timestamp), func.max(model.timestamp)).group_by(target))]
+        if rows: executor.execute(ModerationQueue.__table__.insert(), rows)
+
+@app.cli.command('rebuild-moderation-queue')
+def rebuild_moderation_queue_command():
+    """Recompute the moderation queue from the raw report tables."""
+    rebuild_moderation_queue(db.session)
+    db.session.commit()
+    click.echo('Moderation queue rebuilt.')
+
+def moderation_page(target_type, sort, page):
+    # Returns (pagination of queue entries, {target_id: post/comment}) for one admin page
+    query = ModerationQueue.query.filter_by(target_type=target_type).order_by(*QUEUE_SORTS[sort])
+    while True:
+        entries = query.paginate(page=page, per_page=app.config['MODERATION_PER_PAGE'], error_out=False)
+        ids = [e.target_id for e in entries.items]
+        if target_type == 'post': targets = post_query('admin').filter(BlogPost.id.in_(ids)).all() if ids else []
+        else: targets = Comment.query.options(joinedload(Comment.author)).filter(Comment.id.in_(ids)).all() if ids else []
+        targets = {t.id: t for t in targets}
+        missing = set(ids) - set(targets)
+        if not missing: return entries, targets
+        # Rows whose target is gone would fill pages without ever being shown; drop them and reload
+        clear_moderation(target_type, *missing)
+        db.session.commit()
+
+# --- VIEWER STATE ---
+def load_viewer_state(user, post_ids=(), comment_ids=()):
+    # One query per association table for everything the page shows
+    def ids_in(table, key, wanted):
+        if not user.is_authenticated or not wanted: return set()
+        return set(db.session.scalars(select(table.c[key]).where(table.c.user_id == user.id, table.c[key].in_(list(wanted)))))
+    state = {'liked_posts': ids_in(post_likes, 'post_id', post_ids),
+             'bookmarked_posts': ids_in(bookmarks, 'post_id', post_ids),
+             'liked_comments': ids_in(comment_likes, 'comment_id', comment_ids)}
+    if user.is_authenticated and app.config['WRITE_BEHIND_ENABLED']:
+        # Read-your-writes: overlay taps that are still waiting in the buffer
+        names = {'post_like': 'liked_posts', 'bookmark': 'bookmarked_posts', 'comment_like': 'liked_comments'}
+        for (kind, item_id), wanted in interaction_buffer.pending_for(user.id).items():
+            if wanted: state[names[kind]].add(item_id)
+            else: state[names[kind]].discard(item_id)
+    return state
+
+# --- INSTRUMENTATION ---
+# Per-request timing collected in flask.g: total latency, every SQL statement with its
+# duration (engine events) and top-level template render time. Aggregates are kept in
+# RequestMetrics and exposed in Prometheus text format at /admin/metrics; slow requests
+# and N+1 patterns (the same statement text repeated within one request) are logged.
+slow_log = app.logger.getChild('slow')
+if app.config['SLOW_REQUEST_LOG']: slow_log.addHandler(logging.FileHandler(app.config['SLOW_REQUEST_LOG']))
+
+METRIC_HELP = {
+    'blog_requests_total': ('counter', 'Requests handled, by endpoint and status.'),
+    'blog_sql_statements_total': ('counter', 'SQL statements issued while handling requests.'),
+    'blog_sql_seconds_total': ('counter', 'Time spent executing SQL while handling requests.'),
+    'blog_template_seconds_total': ('counter', 'Time spent rendering templates.'),
+    'blog_n_plus_one_total': ('counter', 'Requests that repeated one SQL statement N_PLUS_ONE_THRESHOLD or more times.'),
+    'blog_slow_requests_total': ('counter', 'Requests slower than SLOW_REQUEST_MS.'),
+}
+
+class RequestMetrics:
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._counters = Counter()
+
+    def observe(self, endpoint, status, seconds, sql, template_seconds, n_plus_one, slow):
+        with self._lock:
+            counts, total = self._latency.get(endpoint) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, seconds)] += 1
+            self._latency[endpoint] = counts, total + seconds
+            self._counters['blog_requests_total', f'endpoint="{endpoint}",status="{status}"'] += 1
+            self._counters['blog_sql_statements_total', f'endpoint="{endpoint}"'] += len(sql)
+            self._counters['blog_sql_seconds_total', f'endpoint="{endpoint}"'] += sum(elapsed for _, elapsed in sql)
+            self._counters['blog_template_seconds_total', f'endpoint="{endpoint}"'] += template_seconds
+            if n_plus_one: self._counters['blog_n_plus_one_total', f'endpoint="{endpoint}"'] += 1
+            if slow: self._counters['blog_slow_requests_total', f'endpoint="{endpoint}"'] += 1
+
+    def render(self):
+        with self._lock:
+            latency, counters = dict(self._latency), dict(self._counters)
+        lines = ['# HELP blog_request_duration_seconds Request latency by endpoint.', '# TYPE blog_request_duration_seconds histogram']
+        for endpoint, (counts, total) in sorted(latency.items()):
+            cumulative = 0
+            for bound, count in zip([*self.buckets, '+Inf'], counts):
+                cumulative += count
+                lines.append(f'blog_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'blog_request_duration_seconds_sum{{endpoint="{endpoint}"}} {total:.6f}')
+            lines.append(f'blog_request_duration_seconds_count{{endpoint="{endpoint}"}} {cumulative}')
+        for name, (kind, help_text) in METRIC_HELP.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            lines += [f'{name}{{{labels}}} {value:g}' for (metric, labels), value in sorted(counters.items()) if metric == name]
+        return '\n'.join(lines) + '\n'
+
+request_metrics = RequestMetrics(app.config['METRICS_BUCKETS'])
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['statement_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('statement_started', time.perf_counter())
+    if has_request_context() and 'sql' in g and len(g.sql) < 1000: g.sql.append((statement, elapsed))
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    if has_request_context() and 'template_depth' in g:
+        if not g.template_depth: g.template_started = time.perf_counter()
+        g.template_depth += 1
+
+@template_rendered.connect_via(app)
+def record_template(sender, template, context, **extra):
+    # Only the outermost render is timed, so cached fragments rendered inside a page aren't counted twice
+    if has_request_context() and g.get('template_depth'):
+        g.template_depth -= 1
+        if not g.template_depth: g.template_seconds += time.perf_counter() - g.template_started
+
+@app.before_request
+def start_request_timer():
+    if not app.config['METRICS_ENABLED']: return
+    g.request_started, g.sql, g.template_depth, g.template_seconds = time.perf_counter(), [], 0, 0.0
+
+@app.after_request
+def record_request(response):
+    if 'request_started' not in g: return response
+    finish = partial(observe_request, g._get_current_object(), request.endpoint or 'unmatched', request.method,
+                     request.path, request.full_path.rstrip('?'), response.status_code)
+    # Streamed pages render (and query) while the body is sent, so they are recorded once it is done
+    if response.is_streamed: response.call_on_close(finish)
+    else: finish()
+    return response
+
+def observe_request(state, endpoint, method, path, full_path, status):
+    elapsed = time.perf_counter() - state.request_started
+    repeated = [(statement, count) for statement, count in Counter(statement for statement, _ in state.sql).most_common(3)
+                if count >= app.config['N_PLUS_ONE_THRESHOLD']]
+    slow = elapsed * 1000 >= app.config['SLOW_REQUEST_MS']
+    request_metrics.observe(endpoint, status, elapsed, state.sql, state.template_seconds, bool(repeated), slow)
+    if repeated:
+        app.logger.warning('Possible N+1 on %s %s: %s', method, path,
+                           '; '.join(f'{count}x {" ".join(statement.split())[:200]}' for statement, count in repeated))
+    if slow:
+        slowest = sorted(state.sql, key=lambda item: item[1], reverse=True)[:5]
+        slow_log.warning('Slow request %s %s -> %s in %.0f ms (%d statements, %.0f ms SQL, %.0f ms templates)%s',
+                         method, full_path, status, elapsed * 1000, len(state.sql),
+                         sum(t for _, t in state.sql) * 1000, state.template_seconds * 1000,
+                         ''.join(f'\n    {t * 1000:7.1f} ms  {" ".join(statement.split())[:300]}' for statement, t in slowest))
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    # Admin session, or a bearer token so a Prometheus scraper doesn't need to log in
+    token = app.config['METRICS_TOKEN']
+    authorized = token and request.headers.get('Authorization') == f'Bearer {token}'
+    if not authorized and not (current_user.is_authenticated and current_user.role == 'admin'): abort(403)
+    return request_metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+# --- SEARCH INDEX ---
+# SQLite FTS5 external-content index over blog_post, kept in sync by triggers.
+# The update trigger only fires for indexed columns, so counter bumps never touch it.
+SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts USING fts5(
+        title, tags, excerpt, content, content='blog_post', content_rowid='id', prefix='2 3 4')""",
+    """CREATE TRIGGER IF NOT EXISTS blog_post_fts_ai AFTER INSERT ON blog_post BEGIN
+        INSERT INTO blog_post_fts(rowid, title, tags, excerpt, content) VALUES (new.id, new.title, new.tags, new.excerpt, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS blog_post_fts_ad AFTER DELETE ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, tags, excerpt, content) VALUES ('delete', old.id, old.title, old.tags, old.excerpt, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS blog_post_fts_au AFTER UPDATE OF title, tags, excerpt, content ON blog_post BEGIN
+        INSERT INTO blog_post_fts(blog_post_fts, rowid, title, tags, excerpt, content) VALUES ('delete', old.id, old.title, old.tags, old.excerpt, old.content);
+        INSERT INTO blog_post_fts(rowid, title, tags, excerpt, content) VALUES (new.id, new.title, new.tags, new.excerpt, new.content);
+    END""",
+]
+# Column weights: title, tags, excerpt, content (bm25 is lower-is-better)
+SEARCH_SQL = """SELECT blog_post.id, blog_post.title, blog_post.thumbnail, blog_post.category
+    FROM blog_post_fts JOIN blog_post ON blog_post.id = blog_post_fts.rowid
+    WHERE blog_post_fts MATCH :q AND blog_post.status = 'active' {category_filter}
+    ORDER BY bm25(blog_post_fts, 10.0, 5.0, 3.0, 1.0) LIMIT :limit"""
+_search_state = {'ready': None}
+
+def search_index_ready():
+    if _search_state['ready'] is None:
+        _search_state['ready'] = db.engine.dialect.name == 'sqlite' and db.session.execute(
+            db.text("SELECT 1 FROM sqlite_master WHERE name = 'blog_post_fts'")).first() is not None
+    return _search_state['ready']
+
+def fts_query(text):
+    # Quote every word so user input can't inject FTS syntax; last word is a typeahead prefix
+    terms = [f'"{word}"' for word in re.findall(r'\w+', text)]
+    if terms: terms[-1] += '*'
+    return ' '.join(terms)
+
+def init_search_index(rebuild=False):
+    if db.engine.dialect.name != 'sqlite': return False
+    with db.engine.begin() as conn:
+        for ddl in SEARCH_DDL: conn.exec_driver_sql(ddl)
+        if rebuild: conn.exec_driver_sql("INSERT INTO blog_post_fts(blog_post_fts) VALUES ('rebuild')")
+    _search_state['ready'] = True
+    return True
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Create the FTS5 search index and its triggers, then reindex every post."""
+    if init_search_index(rebuild=True): click.echo('Search index rebuilt.')
+    else: click.echo('Full-text index needs SQLite; /api/search falls back to LIKE.')
+
+# --- SCHEMA MIGRATIONS ---
+# Ordered, append-only steps that bring an existing blog.db up to the current models.
+# Each runs once in its own transaction and is recorded in schema_version; a fresh
+# database is created from the models directly and stamped with the latest version.
+MIGRATIONS = []
+
+def migration(step):
+    MIGRATIONS.append(step)
+    return step
+
+@migration
+def add_counter_columns(conn):
+    for table, column in [('blog_post', 'like_count'), ('blog_post', 'comment_count'), ('blog_post', 'bookmark_count'), ('comment', 'like_count')]:
+        add_integer_column(conn, table, column)
+
+@migration
+def key_association_tables(conn):
+    # Rebuild each table with its composite primary key, dropping duplicate rows on the way
+    for table in (bookmarks, post_likes, comment_likes):
+        if db.inspect(conn).get_pk_constraint(table.name)['constrained_columns']: continue
+        columns = ', '.join(table.c.keys())
+        conn.exec_driver_sql(f'ALTER TABLE {table.name} RENAME TO {table.name}_old')
+        table.create(conn)
+        conn.exec_driver_sql(f'INSERT INTO {table.name} ({columns}) SELECT DISTINCT {columns} FROM {table.name}_old '
+                             f'WHERE {" AND ".join(f"{c} IS NOT NULL" for c in table.c.keys())}')
+        conn.exec_driver_sql(f'DROP TABLE {table.name}_old')
+    for statement in counter_reconcile_statements(): conn.execute(statement)
+
+@migration
+def add_hot_path_indexes(conn):
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes: index.create(conn, checkfirst=True)
+
+@migration
+def create_search_index(conn):
+    if conn.dialect.name != 'sqlite': return
+    for ddl in SEARCH_DDL: conn.exec_driver_sql(ddl)
+    conn.exec_driver_sql("INSERT INTO blog_post_fts(blog_post_fts) VALUES ('rebuild')")
+
+@migration
+def add_cache_version_column(conn):
+    add_integer_column(conn, 'blog_post', 'cache_version')
+
+@migration
+def create_moderation_queue(conn):
+    ModerationQueue.__table__.create(conn, checkfirst=True)
+    rebuild_moderation_queue(conn)
+
+@migration
+def add_post_stats(conn):
+    add_integer_column(conn, 'blog_post', 'view_count')
+    PostDailyStats.__table__.create(conn, checkfirst=True)
+    for index in BlogPost.__table__.indexes: index.create(conn, checkfirst=True)
+
+@migration
+def create_trending_scores(conn):
+    PostScore.__table__.create(conn, checkfirst=True)
+    WriterScore.__table__.create(conn, checkfirst=True)
+    refresh_trending(conn)
+
+def add_integer_column(conn, table, column):
+    if column not in {c['name'] for c in db.inspect(conn).get_columns(table)}:
+        conn.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+
+def upgrade_database():
+    fresh = not db.inspect(db.engine).has_table('user')
+    db.create_all()
+    with db.engine.begin() as conn:
+        current = conn.execute(select(func.max(schema_version.c.version))).scalar()
+        if current is None:
+            current = len(MIGRATIONS) if fresh else 0
+            conn.execute(schema_version.insert().values(version=current))
+    if fresh: init_search_index()
+    applied = []
+    for version, step in enumerate(MIGRATIONS[current:], start=current + 1):
+        with db.engine.begin() as conn:
+            step(conn)
+            conn.execute(schema_version.update().values(version=version))
+        applied.append(step.__name__)
+    _search_state['ready'] = None
+    return applied
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Create missing tables and apply pending schema migrations."""
+    applied = upgrade_database()
+    click.echo('\n'.join(f'Applied {name}' for name in applied) or 'Database is up to date.')
+
+# --- INDEX CHECK ---
+# Representative statements for the hot routes; each must be answered from an index
+def hot_queries():
+    active = BlogPost.query.filter_by(status='active')
+    return {
+        'feed page': active.order_by(BlogPost.date_posted.desc(), BlogPost.id.desc())
+                           .filter(tuple_(BlogPost.date_posted, BlogPost.id) < tuple_(datetime.utcnow(), 1)).limit(20),
+        'homepage category row': active.filter_by(category='x').order_by(BlogPost.date_posted.desc()).limit(3),
+        'author listing': BlogPost.query.filter_by(author_id=1, status='active').order_by(BlogPost.date_posted.desc()),
+        'writer status counts': select(BlogPost.status, func.count()).where(BlogPost.author_id == 1).group_by(BlogPost.status),
+        'writer post page': BlogPost.query.filter_by(author_id=1).order_by(BlogPost.date_posted.desc(), BlogPost.id.desc()).limit(20),
+        'writer post page by status': BlogPost.query.filter_by(author_id=1, status='draft').order_by(BlogPost.date_posted.desc(), BlogPost.id.desc()).limit(20),
+        'post daily stats': PostDailyStats.query.filter(PostDailyStats.post_id == 1, PostDailyStats.day >= datetime.utcnow().date()),
+        'comment page': Comment.query.filter_by(post_id=1).order_by(Comment.date_posted, Comment.id)
+                                 .filter(tuple_(Comment.date_posted, Comment.id) > tuple_(datetime.utcnow(), 1)).limit(20),
+        'viewer post likes': select(post_likes.c.post_id).where(post_likes.c.user_id == 1, post_likes.c.post_id.in_([1, 2])),
+        'viewer bookmarks': select(bookmarks.c.post_id).where(bookmarks.c.user_id == 1, bookmarks.c.post_id.in_([1, 2])),
+        'viewer comment likes': select(comment_likes.c.comment_id).where(comment_likes.c.user_id == 1, comment_likes.c.comment_id.in_([1, 2])),
+        'post like tally': select(func.count()).select_from(post_likes).where(post_likes.c.post_id == 1),
+        'post report lookup': PostReport.query.filter_by(user_id=1, post_id=1),
+        'post reports by post': PostReport.query.filter_by(post_id=1),
+        'comment report lookup': CommentReport.query.filter_by(user_id=1, comment_id=1),
+        'comment reports by comment': CommentReport.query.filter_by(comment_id=1),
+        'moderation queue page': ModerationQueue.query.filter_by(target_type='post').order_by(*QUEUE_SORTS['count']).limit(25),
+        'moderation queue entry': ModerationQueue.query.filter_by(target_type='comment', target_id=1),
+        'trending posts': select(PostScore.post_id).order_by(PostScore.score.desc()).limit(5),
+        'trending writers': select(WriterScore.user_id).order_by(WriterScore.score.desc()).limit(5),
+        'writer post scores': select(PostScore.score).where(PostScore.author_id.in_([1, 2])),
+        'pending review page': BlogPost.query.filter_by(status='pending').order_by(BlogPost.date_posted, BlogPost.id).limit(25),
+    }
+
+@app.cli.command('explain-hot-queries')
+def explain_hot_queries_command():
+    """Fail if a hot query's SQLite plan falls back to a full table scan."""
+    if db.engine.dialect.name != 'sqlite':
+        click.echo('EXPLAIN QUERY PLAN check only runs on SQLite.')
+        return
+    failed = False
+    for name, query in hot_queries().items():
+        statement = query.statement if hasattr(query, 'statement') else query
+        sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plan = [row[-1] for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql))]
+        scans = [step for step in plan if step.startswith('SCAN') and 'INDEX' not in step]
+        failed = failed or bool(scans)
+        click.echo(f"{'FAIL' if scans else 'ok  '} {name:<28} {'; '.join(plan)}")
+    if failed: raise SystemExit(1)
+
+# --- CACHE ---
+# Shared by the homepage snapshot, feed totals and post fragments. CACHE_BACKEND picks
+# 'memory' (per-process LRU), 'redis' (shared across workers) or a dotted path to any
+# class taking the app config and exposing get/set/delete.
+class LRUCache:
+    # Thread-safe in-process cache bounded to max_entries; values also expire after their TTL
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None: return None
+            if item[1] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries: self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock: self._data.pop(key, None)
+
+class RedisCache:
+    def __init__(self, url, prefix='blog:'):
+        import redis  # optional dependency, only needed for the shared backend
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self._prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+def make_cache(config):
+    backend = config['CACHE_BACKEND']
+    if backend == 'memory': return LRUCache(config['CACHE_MAX_ENTRIES'])
+    if backend == 'redis': return RedisCache(config['CACHE_REDIS_URL'])
+    return import_string(backend)(config)
+
+cache = make_cache(app.config)
+
+# --- FRAGMENT CACHE ---
+# The shared part of post_detail (article body, comment list) is rendered once per
+# post version and reused for every reader; the key moves on whenever cache_version is
+# bumped, so stale entries are never read and simply age out of the LRU. Per-viewer
+# state (likes, bookmarks, comment form) is filled in around the fragments.
+def post_fragments(post):
+    key = f'post:{post.id}:v{post.cache_version}:{int(current_user.is_authenticated)}'
+    fragments = cache.get(key)
+    if fragments is None:
+        comments, next_cursor = comments_page(post.id)
+        fragments = {'article': Markup(render_template('_post_article.html', post=post)),
+                     'comments': Markup(render_template('_post_comments.html', comments=comments)),
+                     'comment_ids': [c.id for c in comments], 'comments_next': next_cursor}
+        cache.set(key, fragments, app.config['FRAGMENT_CACHE_TTL'])
+    return fragments
+
+# --- TRENDING ---
+# Hot score = log2(1 + weighted engagement) + hours_since_epoch / TRENDING_HALF_LIFE_HOURS.
+# Ranking by it is the same as ranking by engagement halved every half-life of post age,
+# but a score only changes when the post's counters do. Each process marks the posts it
+# saw change (post_stats flushes, status changes) and TrendingJob rescores just those every
+# TRENDING_REFRESH_SECONDS, dropping any that are no longer active. 'flask refresh-trending'
+# diffs every active post against PostScore.engagement instead; run it from cron to pick up
+# changes made outside the app (reconcile-counters, manual SQL). A writer's score is log2
+# of the sum of 2**score over their posts, i.e. their total time-decayed engagement,
+# recomputed only for authors of the posts that changed.
+TRENDING_EPOCH = datetime(2024, 1, 1)
+
+def engagement_expr():
+    weights = app.config['TRENDING_WEIGHTS']
+    return (BlogPost.view_count * weights['views'] + BlogPost.like_count * weights['likes']
+            + BlogPost.comment_count * weights['comments'] + BlogPost.bookmark_count * weights['bookmarks'])
+
+def hot_score(engagement, posted):
+    return log2(1 + max(engagement, 0)) + (posted - TRENDING_EPOCH).total_seconds() / 3600 / app.config['TRENDING_HALF_LIFE_HOURS']
+
+def upsert_scores(conn, table, key, rows, existing):
+    # rows: {key: {column: value}}; existing: the keys that already have a row
+    inserts = [{key: k, **values} for k, values in rows.items() if k not in existing]
+    updates = [{'k': k, **values} for k, values in rows.items() if k in existing]
+    if inserts: conn.execute(insert_ignoring_duplicates(table), inserts)
+    if updates:
+        columns = [c for c in updates[0] if c != 'k']
+        conn.execute(table.update().where(table.c[key] == bindparam('k')).values({c: bindparam(c) for c in columns}), updates)
+
+def refresh_trending(conn, rebuild=False, post_ids=None):
+    # post_ids limits the diff to those posts; None checks every post
+    posts, writers = PostScore.__table__, WriterScore.__table__
+    if rebuild:
+        conn.execute(posts.delete())
+        conn.execute(writers.delete())
+    engagement = engagement_expr()
+    changed = (select(BlogPost.id, BlogPost.author_id, BlogPost.date_posted, engagement.label('engagement'), PostScore.post_id.label('scored'))
+               .outerjoin(PostScore, PostScore.post_id == BlogPost.id)
+               .where(BlogPost.status == 'active', or_(PostScore.post_id.is_(None), PostScore.engagement != engagement)))
+    stale = (select(PostScore.post_id, PostScore.author_id).outerjoin(BlogPost, BlogPost.id == PostScore.post_id)
+             .where(or_(BlogPost.id.is_(None), BlogPost.status != 'active')))
+    if post_ids is not None:
+        changed, stale = changed.where(BlogPost.id.in_(post_ids)), stale.where(PostScore.post_id.in_(post_ids))
+    changed, stale = conn.execute(changed).all(), conn.execute(stale).all()
+    if stale: conn.execute(posts.delete().where(posts.c.post_id.in_([row.post_id for row in stale])))
+    upsert_scores(conn, posts, 'post_id', {row.id: {'author_id': row.author_id, 'engagement': row.engagement,
+                                                     'score': hot_score(row.engagement, row.date_posted or TRENDING_EPOCH)} for row in changed},
+                  {row.id for row in changed if row.scored is not None})
+
+    authors = {row.author_id for row in changed} | {row.author_id for row in stale}
+    if not authors: return 0, 0
+    post_scores = {}
+    for author_id, score in conn.execute(select(PostScore.author_id, PostScore.score).where(PostScore.author_id.in_(authors))):
+        post_scores.setdefault(author_id, []).append(score)
+    top = {author_id: max(scores) for author_id, scores in post_scores.items()}
+    totals = {author_id: {'score': top[author_id] + log2(sum(2 ** (s - top[author_id]) for s in scores))} for author_id, scores in post_scores.items()}
+    gone = authors - set(totals)
+    if gone: conn.execute(writers.delete().where(writers.c.user_id.in_(gone)))
+    existing = set(conn.scalars(select(WriterScore.user_id).where(WriterScore.user_id.in_(list(totals)))))
+    upsert_scores(conn, writers, 'user_id', totals, existing)
+    return len(changed) + len(stale), len(authors)
+
+class TrendingJob:
+    def __init__(self):
+        self._dirty = set()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def mark(self, *post_ids):
+        if not app.config['TRENDING_REFRESH_SECONDS']: return
+        with self._lock: self._dirty.update(post_ids)
+        self.start()
+
+    def refresh(self):
+        with self._lock:
+            post_ids, self._dirty = self._dirty, set()
+        if not post_ids: return 0, 0
+        try:
+            with db.engine.begin() as conn: return refresh_trending(conn, post_ids=post_ids)
+        except Exception:
+            with self._lock: self._dirty |= post_ids
+            raise
+
+    def start(self):
+        if self._thread is not None or not app.config['TRENDING_REFRESH_SECONDS']: return
+        with self._lock:
+            if self._thread is not None: return
+            self._thread = threading.Thread(target=self._run, name='trending-refresh', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(app.config['TRENDING_REFRESH_SECONDS']):
+            with app.app_context():
+                try: self.refresh()
+                except Exception: app.logger.exception('Trending refresh failed; will retry')
+
+trending_job = TrendingJob()
+
+@app.cli.command('refresh-trending')
+@click.option('--rebuild', is_flag=True, help='Recompute every score, e.g. after changing TRENDING_HALF_LIFE_HOURS.')
+def refresh_trending_command(rebuild):
+    """Rescore every post whose engagement or status changed since it was last scored."""
+    with db.engine.begin() as conn: posts, writers = refresh_trending(conn, rebuild)
+    click.echo(f'Rescored {posts} posts and {writers} writers.')
+
+def trending_posts(limit):
+    return (post_query('card').join(PostScore, PostScore.post_id == BlogPost.id)
+            .filter(BlogPost.status == 'active', BlogPost.trending_thumbnail != None).order_by(PostScore.score.desc()).limit(limit).all())
+
+def top_writers(limit):
+    return (User.query.options(load_only(User.id, User.username, User.profile_pic)).join(WriterScore, WriterScore.user_id == User.id)
+            .filter(User.role == 'writer', User.is_suspended == False).order_by(WriterScore.score.desc()).limit(limit).all())
+
+# --- HOMEPAGE SNAPSHOT ---
+# The homepage is assembled into plain dicts once and shared by every request until
+# the TTL passes or a route that changes what's visible calls invalidate_homepage().
+def post_card(post):
+    return {'id': post.id, 'title': post.title, 'excerpt': post.excerpt, 'thumbnail': post.thumbnail,
+            'trending_thumbnail': post.trending_thumbnail, 'category': post.category, 'date_posted': post.date_posted,
+            'like_count': post.like_count, 'comment_count': post.comment_count,
+            'author': {'username': post.author.username, 'profile_pic': post.author.profile_pic}}
+
+def build_homepage():
+    active = post_query('card').filter_by(status='active').order_by(BlogPost.date_posted.desc())
+    latest = active.limit(6).all()
+    distinct_cats = db.session.query(BlogPost.category).filter_by(status='active').distinct().limit(2).all()
+    category_data = [{'name': cat_name, 'posts': [post_card(p) for p in active.filter_by(category=cat_name).limit(3)]} for (cat_name,) in distinct_cats]
+    return {'trending': [post_card(p) for p in trending_posts(5)], 'latest': [post_card(p) for p in latest], 'category_data': category_data,
+            'top_writers': [{'username': w.username, 'profile_pic': w.profile_pic} for w in top_writers(5)]}
+
+def homepage_snapshot():
+    snapshot = cache.get('homepage')
+    if snapshot is None:
+        snapshot = build_homepage()
+        cache.set('homepage', snapshot, app.config['HOMEPAGE_CACHE_TTL'])
+    return snapshot
+
+def invalidate_homepage():
+    cache.delete('homepage')
+    cache.delete('active_post_total')
+
+# --- KEYSET PAGINATION ---
+# Feeds and comment threads page on (date_posted, id) instead of OFFSET, so every page
+# costs one index range scan
+def encode_cursor(row):
+    return base64.urlsafe_b64encode(f'{row.date_posted.isoformat()}|{row.id}'.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        stamp, row_id = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split('|')
+        return datetime.fromisoformat(stamp), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def active_posts_page(after=None, limit=None):
+    limit = limit or app.config['POSTS_PER_PAGE']
+    query = post_query('card').filter_by(status='active').order_by(BlogPost.date_posted.desc(), BlogPost.id.desc())
+    position = decode_cursor(after) if after else None
+    if position: query = query.filter(tuple_(BlogPost.date_posted, BlogPost.id) < tuple_(*position))
+    posts = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(posts[limit - 1]) if len(posts) > limit else None
+    return posts[:limit], next_cursor
+
+def comments_page(post_id, after=None, limit=None):
+    # Oldest first, so replies read top to bottom and new comments only ever extend the last page
+    limit = limit or app.config['COMMENTS_PER_PAGE']
+    query = Comment.query.options(joinedload(Comment.author)).filter_by(post_id=post_id).order_by(Comment.date_posted, Comment.id)
+    position = decode_cursor(after) if after else None
+    if position: query = query.filter(tuple_(Comment.date_posted, Comment.id) > tuple_(*position))
+    comments = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(comments[limit - 1]) if len(comments) > limit else None
+    return comments[:limit], next_cursor
+
+def approximate_post_total():
+    total = cache.get('active_post_total')
+    if total is None:
+        total = BlogPost.query.filter_by(status='active').count()
+        cache.set('active_post_total', total, app.config['POST_TOTAL_CACHE_TTL'])
+    return total
+
+# --- PASSWORD HASHING ---
+# Hashing is CPU-bound, so it runs on a small dedicated pool instead of in whichever request
+# thread happens to receive a login. At most HASH_WORKERS hashes run at once and at most
+# HASH_QUEUE_LIMIT more may wait; past that, logins are shed with a 503 rather than letting
+# a credential-stuffing burst tie up every worker.
+hash_pool = ThreadPoolExecutor(max_workers=app.config['HASH_WORKERS'], thread_name_prefix='pwhash')
+hash_slots = threading.BoundedSemaphore(app.config['HASH_WORKERS'] + app.config['HASH_QUEUE_LIMIT'])
+
+class HashingBusy(Exception):
+    pass
+
+def run_hashing(fn, *args):
+    if not hash_slots.acquire(blocking=False): raise HashingBusy()
+    try: return hash_pool.submit(fn, *args).result()
+    finally: hash_slots.release()
+
+def hash_password(password):
+    return run_hashing(generate_password_hash, password, app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_SALT_LENGTH'])
+
+def verify_password(user, password):
+    # Returns (valid, upgraded hash or None); hashes made with older settings are redone while we have the plaintext
+    user_hash, method, salt_length = user.password, app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_SALT_LENGTH']
+    def check():
+        if not check_password_hash(user_hash, password): return False, None
+        return True, generate_password_hash(password, method, salt_length) if password_needs_rehash(user_hash) else None
+    return run_hashing(check)
+
+_hash_prefixes = {}
+
+def hash_params(prefix):
+    # 'pbkdf2:sha256:1000000' -> (('pbkdf2', 'sha256'), (1000000,)); 'scrypt:32768:8:1' -> (('scrypt',), (32768, 8, 1))
+    parts = prefix.split(':')
+    return tuple(p for p in parts if not p.isdigit()), tuple(int(p) for p in parts if p.isdigit())
+
+def password_needs_rehash(pwhash):
+    method, salt_length = app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_SALT_LENGTH']
+    # Werkzeug expands defaults into the stored prefix ('scrypt' -> 'scrypt:32768:8:1'), so compare against a real hash
+    if method not in _hash_prefixes: _hash_prefixes[method] = generate_password_hash('', method, 1).split('$', 1)[0]
+    parts = pwhash.split('$')
+    if len(parts) != 3: return True
+    (name, cost), (want_name, want_cost) = hash_params(parts[0]), hash_params(_hash_prefixes[method])
+    # Only ever upgrade: a different algorithm, fewer rounds or a shorter salt; never rewrite to a cheaper hash
+    if name != want_name or len(cost) != len(want_cost): return True
+    return any(have < want for have, want in zip(cost, want_cost)) or len(parts[1]) < salt_length
+
+# --- RATE LIMITING ---
+class TokenBucketLimiter:
+    # In-memory token buckets keyed by string; each key holds up to `burst` tokens refilled at `per_minute`
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _level(self, key, burst, per_minute, now):
+        tokens, updated = self._buckets.get(key, (burst, now))
+        return min(burst, tokens + (now - updated) * per_minute / 60)
+
+    def retry_after(self, key, burst, per_minute):
+        # Seconds until a token is available, without spending one
+        with self._lock:
+            tokens = self._level(key, burst, per_minute, time.monotonic())
+        return 0 if tokens >= 1 else (1 - tokens) * 60 / per_minute
+
+    def hit(self, key, burst, per_minute):
+        with self._lock:
+            now = time.monotonic()
+            tokens = self._level(key, burst, per_minute, now)
+            if tokens >= 1: tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys: self._buckets.popitem(last=False)
+            return tokens
+
+login_limiter = TokenBucketLimiter()
+
+def login_throttle(username):
+    # Every attempt spends a token from the client's IP bucket. Failures (see
+    # record_login_failure) also spend from a bucket keyed on username *and* IP, so guessing
+    # one account is slowed hard from that address while its owner, elsewhere, can still log in.
+    ip_limit = app.config['LOGIN_IP_BURST'], app.config['LOGIN_IP_PER_MINUTE']
+    user_limit = app.config['LOGIN_USER_BURST'], app.config['LOGIN_USER_PER_MINUTE']
+    wait = max(login_limiter.retry_after(f'ip:{request.remote_addr}', *ip_limit),
+               login_limiter.retry_after(failure_key(username), *user_limit) if username else 0)
+    if not wait: login_limiter.hit(f'ip:{request.remote_addr}', *ip_limit)
+    return wait
+
+def failure_key(username):
+    return f'user:{username.lower()}:{request.remote_addr}'
+
+def record_login_failure(username):
+    if not username: return
+    login_limiter.hit(failure_key(username), app.config['LOGIN_USER_BURST'], app.config['LOGIN_USER_PER_MINUTE'])
+
+def can_view_post(post):
+    if post.status == 'active': return True
+    return current_user.is_authenticated and (current_user.role == 'admin' or current_user.id == post.author_id)
+
+# --- STREAMED PAGES ---
+# Long pages are sent as they render, so the browser gets <head> (and starts on CSS/fonts)
+# before the last comment is written. Jinja yields one string per template node; they are
+# regrouped into STREAM_BUFFER_SIZE chunks so the server isn't doing a write per node.
+def buffered(chunks, size):
+    parts, length = [], 0
+    for chunk in chunks:
+        parts.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(parts)
+            parts, length = [], 0
+    if parts: yield ''.join(parts)
+
+def render_page(template, **context):
+    if not app.config['STREAM_TEMPLATES']: return render_template(template, **context)
+    # The session cookie is written before the body streams, so pop flashes now; the
+    # template's get_flashed_messages() then reads the copy cached on the request
+    get_flashed_messages()
+    return app.response_class(buffered(stream_template(template, **context), app.config['STREAM_BUFFER_SIZE']), mimetype='text/html')
+
 # --- API ROUTES ---
 @app.route('/api/search')
 def search_api():
     query = request.args.get('q', '')
     if len(query) < 2: return jsonify([])
-    posts = BlogPost.query.filter(BlogPost.status == 'active', (BlogPost.title.ilike(f'%{query}%') | BlogPost.tags.ilike(f'%{query}%'))).limit(5).all()
-    return jsonify([{'id': p.id, 'title': p.title, 'thumbnail': p.thumbnail or 'default.jpg', 'category': p.category} for p in posts])
+    category = request.args.get('category') or None
+    limit = max(1, min(request.args.get('limit', 5, type=int), 20))
+    if search_index_ready():
+        match = fts_query(query)
+        if not match: return jsonify([])
+        rows = db.session.execute(db.text(SEARCH_SQL.format(category_filter='AND blog_post.category = :category' if category else '')),
+                                  {'q': match, 'category': category, 'limit': limit}).all()
+    else:
+        posts = BlogPost.query.filter(BlogPost.status == 'active', (BlogPost.title.ilike(f'%{query}%') | BlogPost.tags.ilike(f'%{query}%') | BlogPost.excerpt.ilike(f'%{query}%')))
+        if category: posts = posts.filter_by(category=category)
+        rows = posts.with_entities(BlogPost.id, BlogPost.title, BlogPost.thumbnail, BlogPost.category).limit(limit).all()
+    return jsonify([{'id': p.id, 'title': p.title, 'thumbnail': p.thumbnail or 'default.jpg', 'category': p.category} for p in rows])
+
+@app.route('/api/posts')
+def posts_feed_api():
+    limit = max(1, min(request.args.get('limit', app.config['POSTS_PER_PAGE'], type=int), 50))
+    posts, next_cursor = active_posts_page(request.args.get('after'), limit)
+    viewer = load_viewer_state(current_user, post_ids=[p.id for p in posts])
+    items = [dict(post_card(p), date_posted=p.date_posted.isoformat(), bookmarked=p.id in viewer['bookmarked_posts'],
+                  url=url_for('post_detail', post_id=p.id),
+                  thumbnail_url=upload_url(p.thumbnail, 'card') if p.thumbnail else None,
+                  author_url=url_for('public_profile', username=p.author.username),
+                  author_pic_url=upload_url(p.author.profile_pic, 'avatar')) for p in posts]
+    return jsonify({'items': items, 'html': render_template('_post_cards.html', posts=posts, viewer=viewer), 'next': next_cursor})
+
+@app.route('/api/post/<int:post_id>/comments')
+def post_comments_api(post_id):
+    post = db.session.get(BlogPost, post_id)
+    if post is None or not can_view_post(post): abort(404)
+    limit = max(1, min(request.args.get('limit', app.config['COMMENTS_PER_PAGE'], type=int), 100))
+    comments, next_cursor = comments_page(post.id, request.args.get('cursor'), limit)
+    viewer = load_viewer_state(current_user, comment_ids=[c.id for c in comments])
+    items = [{'id': c.id, 'content': c.content, 'date_posted': c.date_posted.isoformat(), 'date_label': c.date_posted.strftime('%b %d'),
+              'like_count': c.like_count, 'liked': c.id in viewer['liked_comments'],
+              'author': {'username': c.author.username, 'url': url_for('public_profile', username=c.author.username),
+                         'pic_url': upload_url(c.author.profile_pic, 'avatar')}} for c in comments]
+    return jsonify({'items': items, 'html': render_template('_post_comments.html', comments=comments), 'next': next_cursor})
+
+@app.route('/api/bookmarks')
+@login_required
+def bookmarks_api():
+    # Saved-posts drawer, newest bookmark target first; cursor is the last post id seen
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    query = db.session.query(BlogPost).options(load_only(BlogPost.id, BlogPost.title, BlogPost.thumbnail, BlogPost.category))\
+        .join(bookmarks, bookmarks.c.post_id == BlogPost.id).filter(bookmarks.c.user_id == current_user.id)
+    after = request.args.get('cursor', type=int)
+    if after: query = query.filter(bookmarks.c.post_id < after)
+    posts = query.order_by(bookmarks.c.post_id.desc()).limit(limit + 1).all()
+    items = [{'id': p.id, 'title': p.title, 'category': p.category, 'url': url_for('post_detail', post_id=p.id),
+              'thumbnail_url': upload_url(p.thumbnail or 'default.jpg', 'avatar')} for p in posts[:limit]]
+    return jsonify({'items': items, 'html': render_template('_saved_posts.html', posts=posts[:limit]),
+                    'next': posts[limit - 1].id if len(posts) > limit else None})
 
 @app.route('/api/bookmark/<int:post_id>', methods=['POST'])
 @login_required
 def toggle_bookmark(post_id):
     post = BlogPost.query.get_or_404(post_id)
-    if post in current_user.bookmarked_posts:
-        current_user.bookmarked_posts.remove(post)
-        status = 'removed'
-    else:
-        current_user.bookmarked_posts.append(post)
-        status = 'added'
-    db.session.commit()
-    return jsonify({'status': status})
+    added, count = toggle_interaction('bookmark', post.id)
+    return jsonify({'status': 'added' if added else 'removed', 'count': count})
 
 @app.route('/api/like-post/<int:post_id>', methods=['POST'])
 @login_required
 def toggle_post_like(post_id):
     post = BlogPost.query.get_or_404(post_id)
-    if post in current_user.liked_posts:
-        current_user.liked_posts.remove(post)
-        status = 'removed'
-    else:
-        current_user.liked_posts.append(post)
-        status = 'added'
-    db.session.commit()
-    return jsonify({'status': status, 'count': post.liked_by.count()})
+    added, count = toggle_interaction('post_like', post.id)
+    return jsonify({'status': 'added' if added else 'removed', 'count': count})
 
 @app.route('/api/like-comment/<int:comment_id>', methods=['POST'])
 @login_required
 def toggle_comment_like(comment_id):
     comment = Comment.query.get_or_404(comment_id)
-    if comment in current_user.liked_comments:
-        current_user.liked_comments.remove(comment)
-        status = 'removed'
-    else:
-        current_user.liked_comments.append(comment)
-        status = 'added'
-    db.session.commit()
-    return jsonify({'status': status, 'count': comment.liked_by.count()})
+    added, count = toggle_interaction('comment_like', comment.id, post_id=comment.post_id)
+    return jsonify({'status': 'added' if added else 'removed', 'count': count})
 
 # --- ✅ REPORT SUBMISSION ROUTES ---
 
@@ -169,11 +1494,13 @@ def toggle_comment_like(comment_id):
 @login_required
 def report_post(post_id):
     reason = request.form.get('reason')
+    BlogPost.query.get_or_404(post_id)
     # Prevent duplicate reports by same user
     existing = PostReport.query.filter_by(user_id=current_user.id, post_id=post_id).first()
     if not existing:
-        new_report = PostReport(reason=reason, user_id=current_user.id, post_id=post_id)
+        new_report = PostReport(reason=reason, user_id=current_user.id, post_id=post_id, timestamp=datetime.utcnow())
         db.session.add(new_report)
+        enqueue_report('post', post_id, reason, new_report.timestamp)
         db.session.commit()
         flash('Report submitted. Admins will review it.', 'warning')
     else:
@@ -188,8 +1515,9 @@ def report_comment(comment_id):
     # Prevent duplicate
     existing = CommentReport.query.filter_by(user_id=current_user.id, comment_id=comment_id).first()
     if not existing:
-        new_report = CommentReport(reason=reason, user_id=current_user.id, comment_id=comment_id)
+        new_report = CommentReport(reason=reason, user_id=current_user.id, comment_id=comment_id, timestamp=datetime.utcnow())
         db.session.add(new_report)
+        enqueue_report('comment', comment_id, reason, new_report.timestamp)
         db.session.commit()
         flash('Comment reported.', 'warning')
     else:
@@ -199,38 +1527,34 @@ def report_comment(comment_id):
 # --- PUBLIC ROUTES ---
 @app.route('/')
 def index():
-    trending = BlogPost.query.filter(BlogPost.status=='active', BlogPost.trending_thumbnail != None).order_by(BlogPost.date_posted.desc()).limit(5).all()
-    latest = BlogPost.query.filter_by(status='active').order_by(BlogPost.date_posted.desc()).limit(6).all()
-    distinct_cats = db.session.query(BlogPost.category).filter_by(status='active').distinct().limit(2).all()
-    category_data = []
-    for cat_tuple in distinct_cats:
-        cat_name = cat_tuple[0]
-        cat_posts = BlogPost.query.filter_by(status='active', category=cat_name).order_by(BlogPost.date_posted.desc()).limit(3).all()
-        category_data.append({'name': cat_name, 'posts': cat_posts})
-    top_writers = User.query.filter_by(role='writer').limit(5).all()
-    return render_template('index.html', trending=trending, latest=latest, category_data=category_data, top_writers=top_writers)
+    snapshot = homepage_snapshot()
+    viewer = load_viewer_state(current_user, post_ids=[p['id'] for p in snapshot['latest']])
+    return render_template('index.html', viewer=viewer, **snapshot)
 
 @app.route('/all-posts')
 def all_posts():
-    page = request.args.get('page', 1, type=int)
-    pagination = BlogPost.query.filter_by(status='active').order_by(BlogPost.date_posted.desc()).paginate(page=page, per_page=20, error_out=False)
-    return render_template('all_posts.html', pagination=pagination)
+    after = request.args.get('after')
+    posts, next_cursor = active_posts_page(after)
+    viewer = load_viewer_state(current_user, post_ids=[p.id for p in posts])
+    return render_page('all_posts.html', posts=posts, next_cursor=next_cursor, after=after, total=approximate_post_total(), viewer=viewer)
 
 @app.route('/post/<int:post_id>')
 def post_detail(post_id):
-    post = BlogPost.query.get_or_404(post_id)
-    if post.status != 'active':
-        if not current_user.is_authenticated or (current_user.role != 'admin' and current_user.id != post.author_id):
-            flash('This post is not available.', 'warning')
-            return redirect(url_for('index'))
-    return render_template('post_detail.html', post=post)
+    post = post_query('detail').filter_by(id=post_id).first_or_404()
+    if not can_view_post(post):
+        flash('This post is not available.', 'warning')
+        return redirect(url_for('index'))
+    if post.status == 'active' and current_user.get_id() != str(post.author_id): post_stats.record(post.id, views=1)
+    fragments = post_fragments(post)
+    viewer = load_viewer_state(current_user, post_ids=[post.id], comment_ids=fragments['comment_ids'])
+    return render_page('post_detail.html', post=post, fragments=fragments, viewer=viewer)
 
 @app.route('/u/<username>')
 def public_profile(username):
     user = User.query.filter_by(username=username).first_or_404()
     posts = []
     if user.role == 'writer':
-        posts = BlogPost.query.filter_by(author_id=user.id, status='active').order_by(BlogPost.date_posted.desc()).all()
+        posts = post_query('card').filter_by(author_id=user.id, status='active').order_by(BlogPost.date_posted.desc()).all()
     return render_template('public_profile.html', user=user, posts=posts)
 
 @app.route('/post/<int:post_id>/comment', methods=['POST'])
@@ -244,7 +1568,10 @@ def add_comment(post_id):
     if content:
         comment = Comment(content=content, author=current_user, post=post)
         db.session.add(comment)
+        bump_counter(BlogPost, 'comment_count', post.id, 1)
+        bump_counter(BlogPost, 'cache_version', post.id, 1)
         db.session.commit()
+        post_stats.record(post.id, comments=1)
         flash('Comment added!', 'success')
     return redirect(url_for('post_detail', post_id=post_id))
 
@@ -257,6 +1584,7 @@ def apply_writer():
     if current_user.role == 'user':
         current_user.is_writer_applicant = True
         db.session.commit()
+        invalidate_user(current_user.id)
         flash('Request sent to Admin.', 'info')
     return redirect(url_for('user_profile'))
 
@@ -267,7 +1595,15 @@ def signup():
         username = request.form.get('username')
         password = request.form.get('password')
         role = 'admin' if username.lower() == 'admin' else 'user'
-        new_user = User(username=username, password=generate_password_hash(password, method='pbkdf2:sha256'), role=role)
+        wait = login_throttle(None)
+        if wait:
+            flash(f'Too many attempts. Try again in {ceil(wait)} seconds.', 'danger')
+            return render_template('signup.html'), 429
+        try: password_hash = hash_password(password)
+        except HashingBusy:
+            flash('We are busy right now, please try again in a moment.', 'danger')
+            return render_template('signup.html'), 503
+        new_user = User(username=username, password=password_hash, role=role)
         try:
             db.session.add(new_user)
             db.session.commit()
@@ -282,14 +1618,26 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
+        wait = login_throttle(username)
+        if wait:
+            flash(f'Too many login attempts. Try again in {ceil(wait)} seconds.', 'danger')
+            return render_template('login.html'), 429
         user = User.query.filter_by(username=username).first()
-        if user and check_password_hash(user.password, password):
+        try: valid, upgraded = verify_password(user, password) if user else (False, None)
+        except HashingBusy:
+            flash('We are busy right now, please try again in a moment.', 'danger')
+            return render_template('login.html'), 503
+        if valid:
+            if upgraded:
+                user.password = upgraded
+                db.session.commit()
             login_user(user)
             if user.is_suspended: flash('Your account is suspended. Posting/Commenting is restricted.', 'warning')
             if user.role == 'admin': return redirect(url_for('dashboard_admin'))
             elif user.role == 'writer': return redirect(url_for('dashboard_writer'))
             else: return redirect(url_for('user_profile'))
         else:
+            record_login_failure(username)
             flash('Login failed.', 'danger')
     return render_template('login.html')
 
@@ -308,11 +1656,11 @@ def user_profile():
         current_user.hobbies = request.form.get('hobbies')
         if 'profile_pic' in request.files:
             file = request.files['profile_pic']
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                current_user.profile_pic = filename
+            filename = store_upload(file, 'avatar')
+            if filename: current_user.profile_pic = filename
         db.session.commit()
+        invalidate_user(current_user.id)
+        if current_user.role == 'writer': invalidate_homepage()
         flash('Profile Updated!', 'success')
     return render_template('profile.html')
 
@@ -321,9 +1669,12 @@ def user_profile():
 @login_required
 def dashboard_admin():
     if current_user.role != 'admin': return redirect(url_for('index'))
-    return render_template('dashboard_admin.html', 
-                           pending_posts=BlogPost.query.filter_by(status='pending').all(), 
-                           writer_applicants=User.query.filter_by(is_writer_applicant=True, role='user').all())
+    per_page = app.config['MODERATION_PER_PAGE']
+    pending_posts = post_query('admin').filter_by(status='pending').order_by(BlogPost.date_posted, BlogPost.id)\
+        .paginate(page=request.args.get('posts_page', 1, type=int), per_page=per_page, error_out=False)
+    writer_applicants = User.query.filter_by(is_writer_applicant=True, role='user').order_by(User.id)\
+        .paginate(page=request.args.get('applicants_page', 1, type=int), per_page=per_page, error_out=False)
+    return render_template('dashboard_admin.html', pending_posts=pending_posts, writer_applicants=writer_applicants)
 
 @app.route('/admin/users')
 @login_required
@@ -345,18 +1696,19 @@ def admin_users():
 @login_required
 def admin_post_reports():
     if current_user.role != 'admin': return redirect(url_for('index'))
-    # Query to count reports per post and order by count descending
-    ranked_posts = db.session.query(BlogPost, func.count(PostReport.id).label('report_count'))\
-        .join(PostReport).group_by(BlogPost.id).order_by(desc('report_count')).all()
-    return render_template('admin_post_reports.html', items=ranked_posts)
+    sort = request.args.get('sort') if request.args.get('sort') in QUEUE_SORTS else 'count'
+    entries, posts = moderation_page('post', sort, request.args.get('page', 1, type=int))
+    items = [(entry, posts[entry.target_id]) for entry in entries.items]
+    return render_template('admin_post_reports.html', items=items, pagination=entries, sort=sort)
 
 @app.route('/admin/reports/comments')
 @login_required
 def admin_comment_reports():
     if current_user.role != 'admin': return redirect(url_for('index'))
-    ranked_comments = db.session.query(Comment, func.count(CommentReport.id).label('report_count'))\
-        .join(CommentReport).group_by(Comment.id).order_by(desc('report_count')).all()
-    return render_template('admin_comment_reports.html', items=ranked_comments)
+    sort = request.args.get('sort') if request.args.get('sort') in QUEUE_SORTS else 'count'
+    entries, comments = moderation_page('comment', sort, request.args.get('page', 1, type=int))
+    items = [(entry, comments[entry.target_id]) for entry in entries.items]
+    return render_template('admin_comment_reports.html', items=items, pagination=entries, sort=sort)
 
 # --- REPORT ACTIONS ---
 
@@ -365,8 +1717,11 @@ def admin_comment_reports():
 def delete_reported_post(id):
     if current_user.role == 'admin':
         post = BlogPost.query.get_or_404(id)
+        clear_post_moderation(post.id)
         db.session.delete(post)
         db.session.commit()
+        trending_job.mark(id)
+        invalidate_homepage()
         flash('Post permanently deleted.', 'success')
     return redirect(url_for('admin_post_reports'))
 
@@ -376,6 +1731,7 @@ def dismiss_post_reports(id):
     if current_user.role == 'admin':
         # Delete all reports for this post, keep the post
         PostReport.query.filter_by(post_id=id).delete()
+        clear_moderation('post', id)
         db.session.commit()
         flash('Reports rejected (cleared). Post is safe.', 'info')
     return redirect(url_for('admin_post_reports'))
@@ -385,8 +1741,12 @@ def dismiss_post_reports(id):
 def delete_reported_comment(id):
     if current_user.role == 'admin':
         comment = Comment.query.get_or_404(id)
+        bump_counter(BlogPost, 'comment_count', comment.post_id, -1)
+        bump_counter(BlogPost, 'cache_version', comment.post_id, 1)
+        clear_moderation('comment', comment.id)
         db.session.delete(comment)
         db.session.commit()
+        post_stats.record(comment.post_id, comments=-1)
         flash('Comment deleted.', 'success')
     return redirect(url_for('admin_comment_reports'))
 
@@ -395,6 +1755,7 @@ def delete_reported_comment(id):
 def dismiss_comment_reports(id):
     if current_user.role == 'admin':
         CommentReport.query.filter_by(comment_id=id).delete()
+        clear_moderation('comment', id)
         db.session.commit()
         flash('Reports rejected (cleared). Comment is safe.', 'info')
     return redirect(url_for('admin_comment_reports'))
@@ -408,6 +1769,8 @@ def suspend_user(user_id):
         if user.role != 'admin':
             user.is_suspended = True
             db.session.commit()
+            invalidate_user(user.id)
+            invalidate_homepage()
             flash(f'{user.username} suspended.', 'warning')
     return redirect(request.referrer)
 
@@ -418,6 +1781,8 @@ def activate_user(user_id):
         user = User.query.get_or_404(user_id)
         user.is_suspended = False
         db.session.commit()
+        invalidate_user(user.id)
+        invalidate_homepage()
         flash(f'{user.username} active.', 'success')
     return redirect(request.referrer)
 
@@ -429,6 +1794,8 @@ def make_writer(user_id):
         user.role = 'writer'
         user.is_writer_applicant = False
         db.session.commit()
+        invalidate_user(user.id)
+        invalidate_homepage()
         flash(f'{user.username} is now Writer.', 'success')
     return redirect(request.referrer)
 
@@ -440,6 +1807,8 @@ def make_user_role(user_id):
         if user.role != 'admin':
             user.role = 'user'
             db.session.commit()
+            invalidate_user(user.id)
+            invalidate_homepage()
     return redirect(request.referrer)
 
 @app.route('/approve/<int:id>')
@@ -448,6 +1817,8 @@ def approve_post(id):
     if current_user.role == 'admin':
         BlogPost.query.get_or_404(id).status = 'active'
         db.session.commit()
+        trending_job.mark(id)
+        invalidate_homepage()
     return redirect(url_for('dashboard_admin'))
 
 @app.route('/reject/<int:id>')
@@ -456,6 +1827,8 @@ def reject_post(id):
     if current_user.role == 'admin':
         BlogPost.query.get_or_404(id).status = 'rejected'
         db.session.commit()
+        trending_job.mark(id)
+        invalidate_homepage()
     return redirect(url_for('dashboard_admin'))
 
 # --- WRITER/POST CRUD ---
@@ -463,14 +1836,32 @@ def reject_post(id):
 @login_required
 def dashboard_writer():
     if current_user.role != 'writer': return redirect(url_for('index'))
-    return render_template('dashboard_writer.html', active=BlogPost.query.filter_by(author_id=current_user.id, status='active').count(), pending=BlogPost.query.filter_by(author_id=current_user.id, status='pending').count(), draft=BlogPost.query.filter_by(author_id=current_user.id, status='draft').count(), rejected=BlogPost.query.filter_by(author_id=current_user.id, status='rejected').count())
+    counts = dict(db.session.execute(select(BlogPost.status, func.count()).where(BlogPost.author_id == current_user.id).group_by(BlogPost.status)).all())
+    return render_template('dashboard_writer.html', **{status: counts.get(status, 0) for status in POST_STATUSES})
 
 @app.route('/writer/posts')
 @login_required
 def manage_posts():
     if current_user.role != 'writer': return redirect(url_for('index'))
-    posts = BlogPost.query.filter_by(author_id=current_user.id).order_by(BlogPost.date_posted.desc()).all()
-    return render_template('manage_posts.html', posts=posts)
+    status = request.args.get('status')
+    if status not in POST_STATUSES: status = None
+    query = post_query('writer').filter_by(author_id=current_user.id)
+    if status: query = query.filter_by(status=status)
+    pagination = query.order_by(BlogPost.date_posted.desc(), BlogPost.id.desc()).paginate(
+        page=request.args.get('page', 1, type=int), per_page=app.config['POSTS_PER_PAGE'], error_out=False)
+    return render_template('manage_posts.html', pagination=pagination, posts=pagination.items, status=status)
+
+@app.route('/writer/posts/<int:post_id>/analytics')
+@login_required
+def post_analytics(post_id):
+    post = post_query('writer').filter_by(id=post_id).first_or_404()
+    if current_user.role != 'admin' and post.author_id != current_user.id: return redirect(url_for('index'))
+    days = request.args.get('days', app.config['ANALYTICS_DAYS'], type=int)
+    if days not in ANALYTICS_RANGES: days = app.config['ANALYTICS_DAYS']
+    series = post_analytics_series(post.id, days)
+    totals = {column: sum(day[column] for day in series) for column in ANALYTICS_COLUMNS}
+    peak = max([day['views'] for day in series] + [1])
+    return render_template('post_analytics.html', post=post, series=series, totals=totals, peak=peak, days=days, ranges=ANALYTICS_RANGES)
 
 @app.route('/create', methods=['GET', 'POST'])
 @login_required
@@ -488,10 +1879,8 @@ def create_post():
         status = 'pending' if request.form.get('action') == 'submit' else 'draft'
         thumb = request.files.get('thumbnail')
         trend = request.files.get('trending_thumbnail')
-        thumb_file = secure_filename(thumb.filename) if thumb else None
-        trend_file = secure_filename(trend.filename) if trend else None
-        if thumb_file: thumb.save(os.path.join(app.config['UPLOAD_FOLDER'], thumb_file))
-        if trend_file: trend.save(os.path.join(app.config['UPLOAD_FOLDER'], trend_file))
+        thumb_file = store_upload(thumb, 'card', 'large', 'avatar')
+        trend_file = store_upload(trend, 'banner')
         post = BlogPost(title=title, excerpt=excerpt, content=content, category=category, tags=tags, thumbnail=thumb_file, trending_thumbnail=trend_file, author=current_user, status=status)
         db.session.add(post)
         db.session.commit()
@@ -514,19 +1903,16 @@ def edit_post(id):
         post.tags = request.form.get('tags')
         if request.form.get('action') == 'submit': post.status = 'pending'
         elif request.form.get('action') == 'draft': post.status = 'draft'
+        post.cache_version = BlogPost.cache_version + 1
         if 'thumbnail' in request.files:
-            file = request.files['thumbnail']
-            if file:
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                post.thumbnail = filename
+            filename = store_upload(request.files['thumbnail'], 'card', 'large', 'avatar')
+            if filename: post.thumbnail = filename
         if 'trending_thumbnail' in request.files:
-            file = request.files['trending_thumbnail']
-            if file:
-                filename = secure_filename(file.filename)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                post.trending_thumbnail = filename
+            filename = store_upload(request.files['trending_thumbnail'], 'banner')
+            if filename: post.trending_thumbnail = filename
         db.session.commit()
+        trending_job.mark(post.id)
+        invalidate_homepage()
         return redirect(url_for('manage_posts'))
     return render_template('edit_post.html', post=post)
 
@@ -535,12 +1921,42 @@ def edit_post(id):
 def delete_post(id):
     post = BlogPost.query.get_or_404(id)
     if current_user.role == 'admin' or current_user.id == post.author_id:
+        clear_post_moderation(post.id)
         db.session.delete(post)
         db.session.commit()
+        trending_job.mark(id)
+        invalidate_homepage()
         flash('Post deleted.', 'success')
     return redirect(url_for('manage_posts') if current_user.role == 'writer' else url_for('dashboard_admin'))
 
-if __name__ == '__main__':
+# --- STARTUP ---
+# Schema changes and warm-up run once per process before it takes traffic, never inside a
+# request. The app stays a module-level singleton (every route hangs off it), so
+# create_app() prepares that instance rather than building a new one; wsgi.py,
+# gunicorn.conf.py and `python main.py` all go through it.
+def warm_up():
+    timings, started = {}, time.perf_counter()
+    for name in app.jinja_env.list_templates(filter_func=lambda name: name.endswith('.html')): app.jinja_env.get_template(name)
+    timings['templates_ms'] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    connections = [db.engine.connect() for _ in range(app.config['WARMUP_CONNECTIONS'])]
+    for conn in connections: conn.exec_driver_sql('SELECT 1')
+    for conn in connections: conn.close()
+    timings['pool_ms'] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    search_index_ready()
+    homepage_snapshot()
+    timings['homepage_ms'] = (time.perf_counter() - started) * 1000
+    return timings
+
+def create_app():
     with app.app_context():
-        db.create_all()
-    app.run(host='0.0.0.0', port=8080)
\ No newline at end of file
+        if app.config['SCHEMA_ON_STARTUP']:
+            for name in upgrade_database(): app.logger.info('Applied migration %s', name)
+        if app.config['WARMUP_ON_STARTUP']:
+            app.logger.info('Warm-up: %s', ', '.join(f'{step} {ms:.0f}' for step, ms in warm_up().items()))
+        db.session.remove()
+    return app
+
+if __name__ == '__main__':
+    create_app().run(host='0.0.0.0', port=8080)
\ No newline at end of file
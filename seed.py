@@ -0,0 +1,170 @@
+"""Fill the database with synthetic users, posts, comments, likes, bookmarks and reports.
+
+    python seed.py --scale small                        # a few thousand rows, seconds
+    python seed.py --scale large --database sqlite:////tmp/big.db   # 100k users, 1M comments
+    python seed.py --users 5000 --comments 200000 --seed 7
+
+Popularity follows a power law: a handful of posts collect most of the likes, comments
+and bookmarks, a few accounts do most of the liking, and reports pile up on a small set
+of targets the way they do during a brigading incident. The same --seed always produces
+the same data. Every account's password is 'password'; the admin is 'admin', writers
+are 'writer<N>' and readers 'user<N>'.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+
+SCALES = {
+    'small': {'users': 1000, 'writers': 50, 'posts': 2000, 'comments': 10000, 'post_likes': 40000,
+              'comment_likes': 20000, 'bookmarks': 10000, 'reports': 2000},
+    'medium': {'users': 10000, 'writers': 300, 'posts': 10000, 'comments': 100000, 'post_likes': 400000,
+               'comment_likes': 200000, 'bookmarks': 100000, 'reports': 20000},
+    'large': {'users': 100000, 'writers': 2000, 'posts': 20000, 'comments': 1000000, 'post_likes': 2000000,
+              'comment_likes': 1000000, 'bookmarks': 500000, 'reports': 200000},
+}
+WORDS = ['python', 'flask', 'database', 'cache', 'travel', 'coffee', 'music', 'design', 'startup', 'garden',
+         'cricket', 'recipe', 'history', 'science', 'photography', 'fitness', 'rust', 'search', 'cloud', 'writing',
+         'budget', 'river', 'village', 'election', 'festival', 'monsoon', 'library', 'football', 'poetry', 'sqlite']
+CATEGORIES = ['Tech', 'Life', 'Travel', 'Food', 'Sports', 'Culture', 'Science', 'Politics']
+REASONS = ['Spam', 'Harassment or Hate Speech', 'Misinformation', 'Inappropriate Content', 'Other']
+PASSWORD = 'password'
+
+
+def zipf_weights(n, exponent):
+    # Cumulative weights for random.choices; rank 1 is the most popular item
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def unique_pairs(rng, count, left, right, left_weights, right_weights):
+    # Distinct (left, right) pairs drawn from two power-law populations, capped at what is possible
+    count = min(count, len(left) * len(right) // 2)
+    seen = set()
+    while len(seen) < count:
+        need = count - len(seen)
+        seen.update(zip(rng.choices(left, cum_weights=left_weights, k=need), rng.choices(right, cum_weights=right_weights, k=need)))
+    return sorted(seen)
+
+
+def insert(main, table, rows, batch):
+    for start in range(0, len(rows), batch):
+        main.db.session.execute(table.insert(), rows[start:start + batch])
+    main.db.session.commit()
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed(main, counts, rng, batch, log):
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    step = lambda label, n: log(f'{label:<16} {n:>9,} rows  {time.perf_counter() - started:6.1f}s')
+    password = main.generate_password_hash(PASSWORD, main.app.config['PASSWORD_HASH_METHOD'], main.app.config['PASSWORD_SALT_LENGTH'])
+
+    users = [{'username': 'admin', 'password': password, 'role': 'admin', 'is_writer_applicant': False, 'is_suspended': False}]
+    users += [{'username': f'writer{i}', 'password': password, 'role': 'writer', 'is_writer_applicant': False, 'is_suspended': False,
+               'name': f'Writer {i}', 'profile_pic': 'default.jpg'} for i in range(1, counts['writers'] + 1)]
+    users += [{'username': f'user{i}', 'password': password, 'role': 'user', 'is_writer_applicant': i % 200 == 0,
+               'is_suspended': i % 500 == 0, 'profile_pic': 'default.jpg'} for i in range(1, counts['users'] + 1)]
+    insert(main, main.User.__table__, users, batch)
+    step('users', len(users))
+    user_ids = [row.id for row in main.db.session.execute(main.db.select(main.User.id).order_by(main.User.id))]
+    writer_ids = user_ids[1:counts['writers'] + 1]
+    reader_ids = user_ids[counts['writers'] + 1:] or user_ids
+
+    writer_weights = zipf_weights(len(writer_ids), 0.8)
+    posts = []
+    for i in range(counts['posts']):
+        topic = rng.sample(WORDS, 3)
+        posts.append({'title': f'{sentence(rng, 4)} {topic[0]}', 'excerpt': sentence(rng, 20), 'content': sentence(rng, 300),
+                      'category': rng.choice(CATEGORIES), 'tags': ','.join(topic), 'thumbnail': None,
+                      'status': rng.choices(['active', 'pending', 'draft', 'rejected'], weights=[90, 5, 4, 1])[0],
+                      'date_posted': now - timedelta(minutes=rng.randrange(365 * 24 * 60)),
+                      'author_id': rng.choices(writer_ids, cum_weights=writer_weights)[0]})
+    insert(main, main.BlogPost.__table__, posts, batch)
+    step('posts', len(posts))
+
+    # Popularity is independent of age, so the hot posts are spread through the feed
+    post_rows = main.db.session.execute(main.db.select(main.BlogPost.id, main.BlogPost.date_posted).filter_by(status='active')).all()
+    rng.shuffle(post_rows)
+    post_ids = [row.id for row in post_rows]
+    post_dates = dict(post_rows)
+    post_weights = zipf_weights(len(post_ids), 1.1)
+    reader_weights = zipf_weights(len(reader_ids), 0.9)
+
+    comments = []
+    for post_id, user_id in zip(rng.choices(post_ids, cum_weights=post_weights, k=counts['comments']),
+                                rng.choices(reader_ids, cum_weights=reader_weights, k=counts['comments'])):
+        age = max(1, int((now - post_dates[post_id]).total_seconds()))
+        comments.append({'content': sentence(rng, rng.randint(3, 30)), 'post_id': post_id, 'user_id': user_id,
+                         'date_posted': post_dates[post_id] + timedelta(seconds=rng.randrange(age))})
+    insert(main, main.Comment.__table__, comments, batch)
+    step('comments', len(comments))
+    del comments
+
+    pairs = unique_pairs(rng, counts['post_likes'], reader_ids, post_ids, reader_weights, post_weights)
+    insert(main, main.post_likes, [{'user_id': u, 'post_id': p} for u, p in pairs], batch)
+    step('post likes', len(pairs))
+    pairs = unique_pairs(rng, counts['bookmarks'], reader_ids, post_ids, reader_weights, post_weights)
+    insert(main, main.bookmarks, [{'user_id': u, 'post_id': p} for u, p in pairs], batch)
+    step('bookmarks', len(pairs))
+
+    comment_ids = [row.id for row in main.db.session.execute(main.db.select(main.Comment.id).order_by(main.Comment.id))]
+    if comment_ids:
+        rng.shuffle(comment_ids)
+        comment_weights = zipf_weights(len(comment_ids), 1.1)
+        pairs = unique_pairs(rng, counts['comment_likes'], reader_ids, comment_ids, reader_weights, comment_weights)
+        insert(main, main.comment_likes, [{'user_id': u, 'comment_id': c} for u, c in pairs], batch)
+        step('comment likes', len(pairs))
+
+    # Reports: most land on a few brigaded targets, one report per user and target
+    report_weights = zipf_weights(len(post_ids), 1.6)
+    post_reports = unique_pairs(rng, counts['reports'] * 2 // 3, reader_ids, post_ids, reader_weights, report_weights)
+    insert(main, main.PostReport.__table__, [{'user_id': u, 'post_id': p, 'reason': rng.choice(REASONS),
+                                              'timestamp': now - timedelta(minutes=rng.randrange(7 * 24 * 60))} for u, p in post_reports], batch)
+    comment_reports = []
+    if comment_ids:
+        comment_reports = unique_pairs(rng, counts['reports'] // 3, reader_ids, comment_ids, reader_weights,
+                                       zipf_weights(len(comment_ids), 1.6))
+        insert(main, main.CommentReport.__table__, [{'user_id': u, 'comment_id': c, 'reason': rng.choice(REASONS),
+                                                     'timestamp': now - timedelta(minutes=rng.randrange(7 * 24 * 60))} for u, c in comment_reports], batch)
+    step('reports', len(post_reports) + len(comment_reports))
+
+    main.reconcile_counters()
+    main.rebuild_moderation_queue(main.db.session)
+    main.db.session.commit()
+    main.init_search_index(rebuild=True)
+    with main.db.engine.begin() as conn: main.refresh_trending(conn)
+    step('derived data', 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    for name in SCALES['small']:
+        parser.add_argument(f'--{name.replace("_", "-")}', type=int, help=f'Override the scale preset for {name}.')
+    parser.add_argument('--database', help='SQLAlchemy URL to fill (default: the app config).')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--batch', type=int, default=5000, help='Rows per INSERT batch.')
+    args = parser.parse_args()
+    counts = {name: getattr(args, name) if getattr(args, name) is not None else value for name, value in SCALES[args.scale].items()}
+
+    if args.database: os.environ['BLOG_SQLALCHEMY_DATABASE_URI'] = args.database
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main
+
+    with main.app.app_context():
+        main.upgrade_database()
+        if main.db.session.execute(main.db.select(main.User.id).limit(1)).first():
+            parser.error('the database already has users; seed an empty database')
+        print(f"Seeding {main.app.config['SQLALCHEMY_DATABASE_URI']} ({args.scale}, seed {args.seed})")
+        seed(main, counts, random.Random(args.seed), args.batch, print)
+
+
+if __name__ == '__main__':
+    main()
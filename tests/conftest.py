@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATABASE = os.path.join(tempfile.mkdtemp(prefix='blog-tests-'), 'blog.db')
+# main binds its engine and reads its config at import, so the test settings go in first.
+# Background refreshes are off (or far apart) so each test decides when buffers flush.
+os.environ.update(BLOG_SQLALCHEMY_DATABASE_URI=f'sqlite:///{DATABASE}', BLOG_CACHE_BACKEND='memory',
+                  BLOG_WRITE_BEHIND_ENABLED='false', BLOG_WRITE_BEHIND_INTERVAL_MS='3600000',
+                  BLOG_STATS_FLUSH_INTERVAL_MS='3600000', BLOG_TRENDING_REFRESH_SECONDS='0',
+                  BLOG_WARMUP_ON_STARTUP='false', BLOG_PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+
+import main  # noqa: E402
+import seed  # noqa: E402
+
+# Small enough to seed in about a second, big enough that every page has something to list
+FIXTURE = {'users': 40, 'writers': 3, 'posts': 120, 'comments': 600, 'post_likes': 600,
+           'comment_likes': 300, 'bookmarks': 200, 'reports': 60}
+
+
+def seed_database(counts, monkeypatch):
+    # A fresh database file per seed, plus empty caches and buffers so nothing leaks between tests
+    with main.app.app_context():
+        main.db.session.remove()
+        main.db.engine.dispose()
+        for suffix in ('', '-journal', '-wal', '-shm'):
+            if os.path.exists(DATABASE + suffix): os.remove(DATABASE + suffix)
+        main.upgrade_database()
+        seed.seed(main, counts, random.Random(1), 5000, lambda line: None)
+        main.db.session.remove()
+    monkeypatch.setattr(main, 'cache', main.make_cache(main.app.config))
+    monkeypatch.setattr(main, 'login_limiter', main.TokenBucketLimiter())
+    monkeypatch.setattr(main.post_stats, '_pending', {})
+
+
+def client_for(username=None):
+    client = main.app.test_client()
+    if username:
+        with main.app.app_context(): user_id = main.User.query.filter_by(username=username).one().id
+        with client.session_transaction() as session: session['_user_id'] = str(user_id)
+    return client
+
+
+@pytest.fixture
+def blog(monkeypatch):
+    # No app context is held open: requests made inside one would share its g (and logged-in user)
+    seed_database(FIXTURE, monkeypatch)
+    return main
@@ -0,0 +1,89 @@
+from sqlalchemy import func, select, update
+
+from conftest import client_for
+
+
+def untouched_post(blog, table, username='user1'):
+    # An active post the user has no row for in the given association table
+    with blog.app.app_context():
+        user_id = blog.User.query.filter_by(username=username).one().id
+        taken = select(table.c.post_id).where(table.c.user_id == user_id)
+        return blog.BlogPost.query.filter(blog.BlogPost.status == 'active', blog.BlogPost.id.not_in(taken)).first().id
+
+
+def stored(blog, model, column, item_id):
+    with blog.app.app_context(): return blog.read_counter(model, column, item_id)
+
+
+def tally(blog, table, key, item_id):
+    with blog.app.app_context():
+        return blog.db.session.execute(select(func.count()).select_from(table).where(table.c[key] == item_id)).scalar()
+
+
+def test_post_like_toggles_and_keeps_the_counter_in_step(blog):
+    post_id, client = untouched_post(blog, blog.post_likes), client_for('user1')
+    before = stored(blog, blog.BlogPost, 'like_count', post_id)
+    assert client.post(f'/api/like-post/{post_id}').get_json() == {'status': 'added', 'count': before + 1}
+    assert tally(blog, blog.post_likes, 'post_id', post_id) == before + 1
+    assert client.post(f'/api/like-post/{post_id}').get_json() == {'status': 'removed', 'count': before}
+    assert stored(blog, blog.BlogPost, 'like_count', post_id) == tally(blog, blog.post_likes, 'post_id', post_id) == before
+
+
+def test_bookmark_shows_up_in_the_saved_drawer(blog):
+    post_id, client = untouched_post(blog, blog.bookmarks), client_for('user1')
+    before = stored(blog, blog.BlogPost, 'bookmark_count', post_id)
+    assert client.post(f'/api/bookmark/{post_id}').get_json()['count'] == before + 1
+    assert post_id in [item['id'] for item in client.get('/api/bookmarks?limit=50').get_json()['items']]
+    client.post(f'/api/bookmark/{post_id}')
+    assert post_id not in [item['id'] for item in client.get('/api/bookmarks?limit=50').get_json()['items']]
+
+
+def test_comment_like_invalidates_the_post_fragment(blog):
+    with blog.app.app_context():
+        comment = blog.Comment.query.filter_by(like_count=0).first()
+        comment_id, post_id = comment.id, comment.post_id
+    version = stored(blog, blog.BlogPost, 'cache_version', post_id)
+    assert client_for('user1').post(f'/api/like-comment/{comment_id}').get_json() == {'status': 'added', 'count': 1}
+    assert stored(blog, blog.Comment, 'like_count', comment_id) == 1
+    assert stored(blog, blog.BlogPost, 'cache_version', post_id) == version + 1
+
+
+def test_comment_counter_follows_adds_and_deletes(blog):
+    post_id = untouched_post(blog, blog.post_likes)
+    before = stored(blog, blog.BlogPost, 'comment_count', post_id)
+    client_for('user1').post(f'/post/{post_id}/comment', data={'content': 'Nice read'})
+    assert stored(blog, blog.BlogPost, 'comment_count', post_id) == before + 1
+    with blog.app.app_context(): comment_id = blog.Comment.query.filter_by(post_id=post_id, content='Nice read').one().id
+    client_for('admin').get(f'/admin/action/delete_comment/{comment_id}')
+    assert stored(blog, blog.BlogPost, 'comment_count', post_id) == before
+
+
+def test_reconcile_counters_repairs_drift(blog):
+    post_id = untouched_post(blog, blog.post_likes)
+    with blog.app.app_context():
+        blog.db.session.execute(update(blog.BlogPost).where(blog.BlogPost.id == post_id).values(like_count=999, comment_count=-3))
+        blog.db.session.commit()
+        blog.reconcile_counters()
+    assert stored(blog, blog.BlogPost, 'like_count', post_id) == tally(blog, blog.post_likes, 'post_id', post_id)
+    with blog.app.app_context(): comments = blog.Comment.query.filter_by(post_id=post_id).count()
+    assert stored(blog, blog.BlogPost, 'comment_count', post_id) == comments
+
+
+def test_write_behind_collapses_taps_until_flush(blog, monkeypatch):
+    monkeypatch.setitem(blog.app.config, 'WRITE_BEHIND_ENABLED', True)
+    post_id, client = untouched_post(blog, blog.post_likes), client_for('user1')
+    before = stored(blog, blog.BlogPost, 'like_count', post_id)
+    for _ in range(3): response = client.post(f'/api/like-post/{post_id}').get_json()
+    assert response == {'status': 'added', 'count': before + 1}
+    assert stored(blog, blog.BlogPost, 'like_count', post_id) == before
+    with blog.app.app_context(): assert blog.interaction_buffer.flush() == 1
+    assert stored(blog, blog.BlogPost, 'like_count', post_id) == tally(blog, blog.post_likes, 'post_id', post_id) == before + 1
+
+
+def test_views_are_counted_on_flush(blog):
+    post_id = untouched_post(blog, blog.post_likes)
+    for _ in range(3): assert client_for('user1').get(f'/post/{post_id}').status_code == 200
+    with blog.app.app_context():
+        assert blog.post_stats.flush() == 3
+        assert blog.db.session.get(blog.BlogPost, post_id).view_count == 3
+        assert blog.PostDailyStats.query.filter_by(post_id=post_id).one().views == 3
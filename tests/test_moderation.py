@@ -0,0 +1,73 @@
+import json
+from datetime import datetime
+
+from conftest import client_for
+
+
+def unreported_post(blog):
+    with blog.app.app_context():
+        reported = blog.db.session.query(blog.PostReport.post_id)
+        return blog.BlogPost.query.filter(blog.BlogPost.status == 'active', blog.BlogPost.id.not_in(reported)).first().id
+
+
+def queue_entry(blog, target_type, target_id):
+    with blog.app.app_context():
+        entry = blog.ModerationQueue.query.filter_by(target_type=target_type, target_id=target_id).first()
+        return entry and (entry.report_count, entry.reason_list)
+
+
+def queue_rows(blog):
+    with blog.app.app_context():
+        return sorted((e.target_type, e.target_id, e.report_count, e.reasons) for e in blog.ModerationQueue.query)
+
+
+def test_reports_are_counted_once_per_user(blog):
+    post_id = unreported_post(blog)
+    client_for('user1').post(f'/report/post/{post_id}', data={'reason': 'Spam'})
+    client_for('user1').post(f'/report/post/{post_id}', data={'reason': 'Other'})
+    client_for('user2').post(f'/report/post/{post_id}', data={'reason': 'Misinformation'})
+    assert queue_entry(blog, 'post', post_id) == (2, ['Spam', 'Misinformation'])
+
+
+def test_reporting_a_missing_post_is_a_404(blog):
+    assert client_for('user1').post('/report/post/999999', data={'reason': 'Spam'}).status_code == 404
+    assert queue_entry(blog, 'post', 999999) is None
+
+
+def test_dismissing_clears_the_queue_entry(blog):
+    post_id = unreported_post(blog)
+    client_for('user1').post(f'/report/post/{post_id}', data={'reason': 'Spam'})
+    client_for('admin').get(f'/admin/action/dismiss_post_reports/{post_id}')
+    assert queue_entry(blog, 'post', post_id) is None
+    with blog.app.app_context(): assert blog.PostReport.query.filter_by(post_id=post_id).count() == 0
+
+
+def test_deleting_a_post_drops_its_comments_from_the_queue(blog):
+    with blog.app.app_context():
+        comment_id, post_id = blog.db.session.query(blog.CommentReport.comment_id, blog.Comment.post_id)\
+            .join(blog.Comment, blog.Comment.id == blog.CommentReport.comment_id).first()
+    assert queue_entry(blog, 'comment', comment_id) is not None
+    client_for('admin').get(f'/admin/action/delete_post/{post_id}')
+    assert queue_entry(blog, 'post', post_id) is None
+    assert queue_entry(blog, 'comment', comment_id) is None
+
+
+def test_admin_page_drops_entries_for_missing_targets(blog):
+    with blog.app.app_context():
+        now = datetime.utcnow()
+        blog.db.session.add(blog.ModerationQueue(target_type='post', target_id=999999, report_count=50, first_reported=now,
+                                                 last_reported=now, reasons=json.dumps(['Spam'])))
+        blog.db.session.commit()
+    assert client_for('admin').get('/admin/reports/posts?sort=count').status_code == 200
+    assert queue_entry(blog, 'post', 999999) is None
+
+
+def test_incremental_queue_matches_a_rebuild(blog):
+    post_id = unreported_post(blog)
+    client_for('user1').post(f'/report/post/{post_id}', data={'reason': 'Spam'})
+    client_for('user2').post(f'/report/post/{post_id}', data={'reason': 'Other'})
+    incremental = queue_rows(blog)
+    with blog.app.app_context():
+        blog.rebuild_moderation_queue(blog.db.session)
+        blog.db.session.commit()
+    assert [row[:3] for row in queue_rows(blog)] == [row[:3] for row in incremental]
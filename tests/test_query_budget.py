@@ -0,0 +1,73 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+from flask import url_for
+from sqlalchemy import event
+
+from conftest import FIXTURE, client_for, main, seed_database
+
+# Exact SQL statements per page with cold caches (so index also pays for the user load and
+# snapshot build). Each page is measured on the fixture and on ten times the fixture: the
+# count must not grow with the data, a page of 20 posts costs the same with 20 or 20,000.
+QUERY_BUDGETS = {'index': 9, 'all_posts': 5, 'post_detail': 6, 'public_profile': 3, 'manage_posts': 3, 'search_api': 1,
+                 'dashboard_writer': 2, 'post_analytics': 3,
+                 'dashboard_admin': 5, 'admin_post_reports': 4, 'admin_comment_reports': 4}
+# Account each page is checked as (seed.py usernames); readers see their like/bookmark state
+ACCOUNTS = {'dashboard_writer': 'writer1', 'manage_posts': 'writer1', 'post_analytics': 'writer1',
+            'dashboard_admin': 'admin', 'admin_post_reports': 'admin', 'admin_comment_reports': 'admin'}
+SIZES = {'fixture': FIXTURE, '10x': {name: count * 10 for name, count in FIXTURE.items()}}
+
+
+@contextmanager
+def count_queries():
+    # Only statements from the calling thread, so background flushers can't skew a count
+    counter, thread = {'count': 0}, threading.get_ident()
+    def on_execute(*args):
+        if threading.get_ident() == thread: counter['count'] += 1
+    with main.app.app_context(): engine = main.db.engine
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try: yield counter
+    finally: event.remove(engine, 'before_cursor_execute', on_execute)
+
+
+def budget_urls():
+    with main.app.app_context():
+        writer = main.User.query.filter_by(username='writer1').one()
+        post = (main.BlogPost.query.filter_by(status='active', author_id=writer.id)
+                .order_by(main.BlogPost.comment_count.desc(), main.BlogPost.id).first())
+    with main.app.test_request_context():
+        return {'index': url_for('index'), 'all_posts': url_for('all_posts'), 'search_api': url_for('search_api', q='python'),
+                'post_detail': url_for('post_detail', post_id=post.id), 'public_profile': url_for('public_profile', username='writer1'),
+                'dashboard_writer': url_for('dashboard_writer'), 'manage_posts': url_for('manage_posts'),
+                'post_analytics': url_for('post_analytics', post_id=post.id), 'dashboard_admin': url_for('dashboard_admin'),
+                'admin_post_reports': url_for('admin_post_reports'), 'admin_comment_reports': url_for('admin_comment_reports')}
+
+
+@pytest.fixture(scope='module')
+def measured():
+    # {size: {endpoint: (status, statements)}}, seeding each size once for the whole module
+    results = {}
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        for size, counts in SIZES.items():
+            seed_database(counts, monkeypatch)
+            results[size] = {}
+            for endpoint, url in budget_urls().items():
+                client = client_for(ACCOUNTS.get(endpoint, 'user1'))
+                monkeypatch.setattr(main, 'cache', main.make_cache(main.app.config))
+                # buffered so streamed pages finish rendering (and querying) inside the count
+                with count_queries() as counter: status = client.get(url, buffered=True).status_code
+                results[size][endpoint] = status, counter['count']
+    return results
+
+
+@pytest.mark.parametrize('endpoint', QUERY_BUDGETS)
+def test_query_budget(measured, endpoint):
+    by_size = {size: results[endpoint] for size, results in measured.items()}
+    assert all(status == 200 for status, _ in by_size.values()), by_size
+    assert len({count for _, count in by_size.values()}) == 1, f'statement count grows with the data: {by_size}'
+    assert by_size['fixture'][1] == QUERY_BUDGETS[endpoint]
+
+
+def test_every_checked_page_has_a_budget(measured):
+    assert set(measured['fixture']) == set(QUERY_BUDGETS)
@@ -0,0 +1,18 @@
+"""Production entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+    uvicorn wsgi:asgi_application --workers 4      # needs asgiref (pip install asgiref)
+
+Importing this module runs create_app(): pending migrations, then warm-up, so a worker
+is ready before it accepts its first request.
+"""
+from main import create_app
+
+application = create_app()
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # asgiref is optional; without it only the WSGI callable is available
+    asgi_application = None
+else:
+    asgi_application = WsgiToAsgi(application)